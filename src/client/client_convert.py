@@ -5,9 +5,9 @@ import asyncio
 from langchain_mcp_adapters.client import MultiServerMCPClient
 from langgraph.prebuilt import create_react_agent
 from langchain_google_genai import ChatGoogleGenerativeAI
-import requests
 import logging
 from langchain.tools import tool
+from http_upload import close_http_client, upload_pdf
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -47,14 +47,9 @@ async def upload_file(file_path, delete_after=False):
     """Upload file content to the MCP upload server via Starlette endpoint."""
     file_name = os.path.basename(file_path)
     try:
-        with open(file_path, "rb") as f:
-            files = {"file": (file_name, f, "application/pdf")}
-            data = {"delete_after": str(delete_after).lower()}
-            response = requests.post("http://127.0.0.1:8001/mcp/upload_pdf_tool", files=files, data=data)
-            response.raise_for_status()
-            server_response_data = response.json()
-            logger.info(f"File {file_name} uploaded successfully to MCP upload server")
-            return json.dumps(server_response_data)
+        server_response_data = await upload_pdf(file_path, delete_after)
+        logger.info(f"File {file_name} uploaded successfully to MCP upload server")
+        return json.dumps(server_response_data)
     except Exception as e:
         logger.error(f"File upload failed for {file_name}: {str(e)}")
         raise
@@ -138,6 +133,8 @@ async def main():
 
     except Exception as e:
         print("Error:", str(e))
+    finally:
+        await close_http_client()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,185 @@
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import os
+import time
+from datetime import timedelta
+from typing import Awaitable, Callable, Dict, List
+
+from dotenv import load_dotenv
+from mcp import ClientSession
+from mcp.client.streamable_http import streamablehttp_client
+
+from http_upload import (
+    CONVERT_SERVER_URL, CONVERT_TIMEOUT, close_http_client, error_message, get_http_client, upload_and_convert,
+    upload_pdf,
+)
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Define the project root (two levels up from src/client)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+INPUT_DIR = os.path.join(PROJECT_ROOT, "input")
+
+# Load environment variables from .env in the project root
+load_dotenv(dotenv_path=os.path.join(PROJECT_ROOT, ".env"))
+
+CONVERT_MCP_URL = f"{CONVERT_SERVER_URL}/mcp"
+# Files going through upload + conversion at the same time
+PIPELINE_CONCURRENCY = int(os.getenv("PIPELINE_CONCURRENCY", "4"))
+
+
+def find_pdfs(inputs: List[str], recursive: bool = False) -> List[str]:
+    """Expand files and directories into a sorted list of PDF paths."""
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, "**", "*.pdf") if recursive else os.path.join(item, "*.pdf")
+            paths.update(glob.glob(pattern, recursive=recursive))
+        elif os.path.isfile(item):
+            paths.add(item)
+        else:
+            logger.warning(f"Skipping {item}: no such file or directory")
+    return sorted(paths)
+
+
+async def convert_file(session: ClientSession, file_path: str, local_path: str = None) -> dict:
+    """Upload one PDF, convert it with convert_pdf_to_markdown_tool and optionally download the Markdown to local_path."""
+    start = time.perf_counter()
+    upload = await upload_pdf(file_path)
+    uploaded = time.perf_counter()
+
+    response = await session.call_tool(
+        "convert_pdf_to_markdown_tool",
+        {"pdf_path": upload["path"], "wait": True},
+        read_timeout_seconds=timedelta(seconds=CONVERT_TIMEOUT),
+    )
+    text = "".join(getattr(content, "text", "") for content in response.content)
+    if response.isError:
+        return {"status": "error", "message": text}
+    result = json.loads(text)
+    converted = time.perf_counter()
+
+    if local_path and result["status"] == "success":
+        result["local_path"] = await download_markdown(result["markdown_path"], local_path)
+    result["upload_seconds"] = round(uploaded - start, 3)
+    result["convert_seconds"] = round(converted - uploaded, 3)
+    return result
+
+
+async def convert_file_one_shot(file_path: str, local_path: str = None) -> dict:
+    """Upload and convert one PDF in a single request to /mcp/upload_convert_tool."""
+    start = time.perf_counter()
+    result = await upload_and_convert(file_path)
+    markdown = result.pop("markdown")
+    if local_path:
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        with open(local_path, "w", encoding="utf-8") as f:
+            f.write(markdown)
+        result["local_path"] = local_path
+    result["convert_seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def local_markdown_paths(paths: List[str], output_dir: str) -> Dict[str, str]:
+    """Map each PDF to output_dir/<its path below the PDFs' common directory, as .md>.
+
+    Mirroring the source layout keeps same-named PDFs from different directories
+    (e.g. with --recursive) from writing to the same Markdown file.
+    """
+    if not paths:
+        return {}
+    absolute = {path: os.path.abspath(path) for path in paths}
+    root = os.path.commonpath([os.path.dirname(path) for path in absolute.values()])
+    return {
+        path: os.path.join(output_dir, os.path.splitext(os.path.relpath(abs_path, root))[0] + ".md")
+        for path, abs_path in absolute.items()
+    }
+
+
+async def download_markdown(markdown_path: str, local_path: str) -> str:
+    """Stream a converted file from the server's /output route to local_path."""
+    os.makedirs(os.path.dirname(local_path), exist_ok=True)
+    url = f"{CONVERT_SERVER_URL}/output/{os.path.basename(markdown_path)}"
+    async with get_http_client().stream("GET", url) as response:
+        response.raise_for_status()
+        with open(local_path, "wb") as f:
+            async for chunk in response.aiter_bytes():
+                f.write(chunk)
+    return local_path
+
+
+async def convert_all(paths: List[str], concurrency: int, convert: Callable[[str], Awaitable[dict]]) -> List[dict]:
+    """Run convert on every path, at most concurrency at a time, collecting failures as results."""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(path: str) -> dict:
+        async with semaphore:
+            try:
+                result = await convert(path)
+            except Exception as e:
+                result = {"status": "error", "message": error_message(e)}
+            if result["status"] != "success":
+                logger.error(f"Conversion failed for {path}: {result.get('message')}")
+            return {"file": path, **result}
+
+    return await asyncio.gather(*(run(path) for path in paths))
+
+
+async def run_pipeline(paths: List[str], concurrency: int = PIPELINE_CONCURRENCY, output_dir: str = None,
+                       one_shot: bool = False) -> List[dict]:
+    """Upload and convert PDFs, at most concurrency files at a time.
+
+    By default each file is uploaded and then converted with convert_pdf_to_markdown_tool
+    over one shared MCP session; with one_shot, each file takes a single request to
+    /mcp/upload_convert_tool instead. With output_dir, the Markdown is saved there in the
+    PDFs' directory layout (see local_markdown_paths). Returns one entry per path, in order;
+    failures are reported as {"file", "status": "error", "message"} instead of stopping the run.
+    """
+    local_paths = local_markdown_paths(paths, output_dir) if output_dir else {}
+    if one_shot:
+        return await convert_all(paths, concurrency, lambda path: convert_file_one_shot(path, local_paths.get(path)))
+
+    async with streamablehttp_client(CONVERT_MCP_URL, sse_read_timeout=CONVERT_TIMEOUT) as (read, write, _):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            return await convert_all(paths, concurrency,
+                                     lambda path: convert_file(session, path, local_paths.get(path)))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Upload and convert PDFs without going through the LLM agent")
+    parser.add_argument("inputs", nargs="*", default=[INPUT_DIR], help="PDF files or directories (default: input/)")
+    parser.add_argument("--concurrency", type=int, default=PIPELINE_CONCURRENCY)
+    parser.add_argument("--recursive", action="store_true", help="Include subdirectories")
+    parser.add_argument("--output-dir", help="Download the Markdown files into this directory")
+    parser.add_argument("--one-shot", action="store_true",
+                        help="Upload and convert each file in one request instead of going through MCP")
+    args = parser.parse_args()
+
+    paths = find_pdfs(args.inputs, args.recursive)
+    if not paths:
+        raise FileNotFoundError(f"No PDF files found in {', '.join(args.inputs)}")
+
+    start = time.perf_counter()
+    try:
+        results = await run_pipeline(paths, args.concurrency, args.output_dir, args.one_shot)
+    finally:
+        await close_http_client()
+    elapsed = time.perf_counter() - start
+
+    for result in results:
+        detail = result.get("local_path") or result.get("download_url") or result.get("message", "")
+        print(f"{result['status']:>7}  {result['file']}  {detail}")
+    failed = sum(1 for result in results if result["status"] != "success")
+    print(f"Converted {len(results) - failed} of {len(results)} files in {elapsed:.1f}s")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,12 +2,12 @@ import json
 import os
 from dotenv import load_dotenv
 import asyncio
-import requests
 import logging
 from langchain_mcp_adapters.client import MultiServerMCPClient
 from langgraph.prebuilt import create_react_agent
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.tools import tool 
+from http_upload import close_http_client, upload_pdf
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -42,13 +42,8 @@ async def upload_file(file_path, delete_after=False):
     """Upload file content to the server via Starlette endpoint."""
     file_name = os.path.basename(file_path)
     try:
-        with open(file_path, "rb") as f:
-            files = {"file": (file_name, f, "application/pdf")}
-            data = {"delete_after": str(delete_after).lower()}
-            response = requests.post("http://127.0.0.1:8001/upload/mcp/upload_pdf_tool", files=files, data=data)
-            response.raise_for_status()
-            logger.info(f"File {file_name} uploaded successfully")
-            return file_name
+        await upload_pdf(file_path, delete_after)
+        return file_name
     except Exception as e:
         logger.error(f"File upload failed for {file_name}: {str(e)}")
         raise
@@ -138,6 +133,8 @@ async def main():
     except Exception as e:
         logger.error("Error: %s", str(e))
         raise
+    finally:
+        await close_http_client()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,166 @@
+import argparse
+import asyncio
+import glob
+import logging
+import os
+import random
+from typing import List, Optional, Set, Tuple, Type
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Base URL of the PDF conversion server (upload route and MCP endpoint)
+CONVERT_SERVER_URL = os.getenv("CONVERT_SERVER_URL", "http://127.0.0.1:8001")
+UPLOAD_URL = f"{CONVERT_SERVER_URL}/mcp/upload_pdf_tool"
+UPLOAD_CONVERT_URL = f"{CONVERT_SERVER_URL}/mcp/upload_convert_tool"
+# Files uploaded at the same time by upload_directory
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "4"))
+# Extra attempts after a connection failure or a 429/5xx response
+UPLOAD_RETRIES = int(os.getenv("UPLOAD_RETRIES", "3"))
+# Delay before the first retry in seconds; doubled on every further attempt
+UPLOAD_BACKOFF = float(os.getenv("UPLOAD_BACKOFF", "0.5"))
+# Seconds to wait for the server between bytes (large uploads may take far longer in total)
+UPLOAD_TIMEOUT = float(os.getenv("UPLOAD_TIMEOUT", "60"))
+# Seconds to wait for one conversion before giving up on it
+CONVERT_TIMEOUT = float(os.getenv("CONVERT_TIMEOUT", "600"))
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# Failures that leave the server nothing to work on: the request never got through, or it
+# was turned away before any work started. Only these are safe to retry for a conversion,
+# which the server may still be running after a read timeout or a dropped response
+SEND_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, httpx.WriteError, httpx.WriteTimeout)
+SEND_RETRY_STATUS = {429, 503}
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared keep-alive client, so uploads reuse pooled connections instead of opening one per file."""
+    global _client
+    if _client is None or _client.is_closed:
+        limits = httpx.Limits(max_connections=max(UPLOAD_CONCURRENCY, 10), max_keepalive_connections=max(UPLOAD_CONCURRENCY, 10))
+        _client = httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(UPLOAD_TIMEOUT))
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def post_file(url: str, file_path: str, data: Optional[dict] = None, params: Optional[dict] = None,
+                    retries: int = UPLOAD_RETRIES, read_timeout: Optional[float] = None,
+                    retry_errors: Tuple[Type[Exception], ...] = (httpx.TransportError,),
+                    retry_status: Set[int] = RETRY_STATUS) -> httpx.Response:
+    """POST a file as multipart field "file", streamed from disk, and return the response.
+
+    Exceptions in retry_errors and responses in retry_status are retried with exponential
+    backoff (the file is reopened for every attempt); other error responses raise
+    httpx.HTTPStatusError straight away. read_timeout overrides UPLOAD_TIMEOUT for waiting
+    on the response.
+    """
+    file_name = os.path.basename(file_path)
+    client = get_http_client()
+    timeout = httpx.Timeout(UPLOAD_TIMEOUT, read=read_timeout) if read_timeout else httpx.USE_CLIENT_DEFAULT
+    for attempt in range(retries + 1):
+        try:
+            with open(file_path, "rb") as f:
+                response = await client.post(
+                    url, files={"file": (file_name, f, "application/pdf")}, data=data, params=params,
+                    timeout=timeout,
+                )
+            if response.status_code not in retry_status or attempt == retries:
+                response.raise_for_status()
+                return response
+            reason = f"HTTP {response.status_code}"
+        except retry_errors as e:
+            if attempt == retries:
+                raise
+            reason = f"{type(e).__name__}: {str(e)}"
+        # Jitter keeps concurrent uploads from retrying in lockstep
+        delay = UPLOAD_BACKOFF * (2 ** attempt) * (0.5 + random.random())
+        logger.warning(f"Upload of {file_name} failed ({reason}), retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+
+async def upload_pdf(file_path: str, delete_after: bool = False, retries: int = UPLOAD_RETRIES) -> dict:
+    """Upload one PDF to the conversion server and return its JSON response."""
+    response = await post_file(UPLOAD_URL, file_path, data={"delete_after": str(delete_after).lower()},
+                               retries=retries)
+    logger.info(f"File {os.path.basename(file_path)} uploaded successfully")
+    return response.json()
+
+
+async def upload_and_convert(file_path: str, persist: bool = False, retries: int = UPLOAD_RETRIES) -> dict:
+    """Upload and convert one PDF in a single request; the result includes the Markdown text.
+
+    The server keeps the uploaded PDF only when persist is True. Only failures in
+    SEND_ERRORS/SEND_RETRY_STATUS are retried, so a slow conversion is never started twice.
+    """
+    response = await post_file(UPLOAD_CONVERT_URL, file_path,
+                               params={"format": "json", "persist": str(persist).lower()}, retries=retries,
+                               read_timeout=CONVERT_TIMEOUT, retry_errors=SEND_ERRORS,
+                               retry_status=SEND_RETRY_STATUS)
+    logger.info(f"File {os.path.basename(file_path)} converted successfully")
+    return response.json()
+
+
+def error_message(error: Exception) -> str:
+    """The server's {"status": "error", "message": ...} text for rejected uploads, else the exception text."""
+    if isinstance(error, httpx.HTTPStatusError):
+        try:
+            return error.response.json()["message"]
+        except (ValueError, KeyError, TypeError):
+            pass
+    return str(error)
+
+
+async def upload_directory(directory: str, concurrency: int = UPLOAD_CONCURRENCY, delete_after: bool = False,
+                           pattern: str = "*.pdf", recursive: bool = False) -> List[dict]:
+    """Upload every matching file in a directory, at most concurrency at a time.
+
+    Returns one entry per file, in path order: the server response plus "file", or
+    {"file", "status": "error", "message"} when the upload failed after its retries.
+    """
+    paths = sorted(glob.glob(os.path.join(directory, "**", pattern) if recursive else os.path.join(directory, pattern),
+                             recursive=recursive))
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def upload(path: str) -> dict:
+        async with semaphore:
+            try:
+                return {"file": path, **await upload_pdf(path, delete_after)}
+            except Exception as e:
+                message = error_message(e)
+                logger.error(f"File upload failed for {path}: {message}")
+                return {"file": path, "status": "error", "message": message}
+
+    return await asyncio.gather(*(upload(path) for path in paths))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Upload a directory of PDFs to the conversion server")
+    parser.add_argument("directory", help="Directory holding the PDFs")
+    parser.add_argument("--concurrency", type=int, default=UPLOAD_CONCURRENCY)
+    parser.add_argument("--recursive", action="store_true", help="Include subdirectories")
+    parser.add_argument("--delete-after", action="store_true", help="Ask the server not to keep the files")
+    args = parser.parse_args()
+
+    try:
+        results = await upload_directory(args.directory, args.concurrency, args.delete_after, recursive=args.recursive)
+    finally:
+        await close_http_client()
+    for result in results:
+        print(f"{result['status']:>9}  {result['file']}  {result.get('sha256') or result.get('message', '')}")
+    failed = sum(1 for result in results if result["status"] == "error")
+    print(f"Uploaded {len(results) - failed} of {len(results)} files")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
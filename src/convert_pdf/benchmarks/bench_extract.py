@@ -0,0 +1,42 @@
+"""Benchmark page-parallel PDF extraction from 1 to N worker processes.
+
+Usage (from src/convert_pdf):
+    python -m benchmarks.bench_extract path/to/document.pdf --max-workers 8
+"""
+import argparse
+import os
+import time
+
+from src import pdf2md
+from src.pdf2md import extract_pages
+
+
+def run(pdf_path: str, max_workers: int, repeat: int) -> None:
+    baseline = None
+    baseline_time = None
+    print(f"{'workers':>7} {'seconds':>9} {'speedup':>8} {'identical':>9}")
+    for workers in range(1, max_workers + 1):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            text = extract_pages(pdf_path, workers)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        if baseline is None:
+            baseline, baseline_time = text, best
+        print(f"{workers:>7} {best:>9.3f} {baseline_time / best:>7.2f}x {str(text == baseline):>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel PDF page extraction")
+    parser.add_argument("pdf_path", help="PDF file to extract")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per worker count (best is reported)")
+    args = parser.parse_args()
+    # Always exercise the pool, even for short documents
+    pdf2md.PARALLEL_MIN_PAGES = 1
+    run(args.pdf_path, args.max_workers, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
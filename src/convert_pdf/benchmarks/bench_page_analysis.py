@@ -0,0 +1,135 @@
+"""Per-page timing of the single-pass page analyzer against separate text and table passes.
+
+The previous extraction ran page.extract_text(layout=True) and page.extract_tables() on
+every page, so table cells were analysed twice and appeared in the output twice. This
+reports the time per page of both approaches and counts table cells duplicated in the text.
+
+Usage (from src/convert_pdf):
+    python -m benchmarks.bench_page_analysis path/to/document.pdf
+    python -m benchmarks.bench_page_analysis --generate 20   # synthetic PDF, needs reportlab
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import pdfplumber
+
+from src.pdf2md import extract_page_text, format_table_to_markdown
+from src.structure import blocks_to_text
+
+
+def separate_passes(page) -> str:
+    """The previous per-page extraction: full layout text, then every table again."""
+    parts = [page.extract_text(layout=True), "\n"]
+    for table in page.extract_tables():
+        parts.append("\n" + format_table_to_markdown(table) + "\n")
+    return "".join(parts)
+
+
+def generate_pdf(path: str, pages: int) -> None:
+    """Write a PDF whose pages mix paragraphs with a ruled table."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Table, TableStyle
+
+    styles = getSampleStyleSheet()
+    story = []
+    for index in range(pages):
+        story.append(Paragraph(f"Section {index + 1}", styles["Heading1"]))
+        for _ in range(4):
+            story.append(Paragraph(
+                "Quarterly results were reviewed by the committee, and the figures below summarise "
+                "revenue, cost and margin for each region covered by this report. " * 2, styles["BodyText"]))
+        rows = [["Region", "Revenue", "Cost", "Margin"]]
+        rows += [[f"Region {r}-{index}", f"{1000 + r * 37}", f"{600 + r * 11}", f"{400 + r * 26}"] for r in range(12)]
+        table = Table(rows)
+        table.setStyle(TableStyle([("GRID", (0, 0), (-1, -1), 0.5, colors.black)]))
+        story.append(table)
+        story.append(Paragraph("Figures are unaudited and rounded to the nearest unit.", styles["BodyText"]))
+        story.append(PageBreak())
+    SimpleDocTemplate(path, pagesize=A4).build(story)
+
+
+def time_pages(pdf_path: str, extract, repeat: int) -> tuple:
+    """Best-of-repeat (parse, analysis) seconds per page, and the extracted text of the last run.
+
+    Parsing the page content (shared by both approaches) is timed separately from the
+    text and table analysis that differs between them.
+    """
+    timings = []
+    texts = []
+    with pdfplumber.open(pdf_path) as pdf:
+        page_count = len(pdf.pages)
+    for index in range(page_count):
+        best = None
+        for _ in range(repeat):
+            # Reopen so no run benefits from objects another run already parsed
+            with pdfplumber.open(pdf_path, pages=[index + 1]) as pdf:
+                page = pdf.pages[0]
+                start = time.perf_counter()
+                page.objects
+                parsed = time.perf_counter()
+                text = extract(page)
+                done = time.perf_counter()
+            run = (parsed - start, done - parsed)
+            best = run if best is None or run[1] < best[1] else best
+        timings.append(best)
+        texts.append(text)
+    return timings, texts
+
+
+def single_pass(page) -> str:
+    """The current extraction, flattened to text so both outputs can be compared."""
+    return blocks_to_text(extract_page_text(page))
+
+
+def duplicated_cells(pdf_path: str, texts: list) -> int:
+    """Table cells that also appear in the prose part of the output."""
+    duplicates = 0
+    with pdfplumber.open(pdf_path) as pdf:
+        for page, text in zip(pdf.pages, texts):
+            prose = "\n".join(line for line in text.splitlines() if not line.startswith("|"))
+            for table in page.extract_tables():
+                duplicates += sum(1 for row in table for cell in row if cell and cell.strip() and cell in prose)
+    return duplicates
+
+
+def report(label: str, timings: list, duplicates: int) -> None:
+    parse = [t[0] for t in timings]
+    analysis = sorted(t[1] for t in timings)
+    p95 = analysis[min(len(analysis) - 1, int(len(analysis) * 0.95))]
+    print(f"{label:<16} parse {statistics.mean(parse) * 1000:6.1f} ms/page   "
+          f"analysis mean {statistics.mean(analysis) * 1000:6.1f} ms/page   p95 {p95 * 1000:6.1f} ms   "
+          f"duplicated cells {duplicates}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark single-pass page analysis")
+    parser.add_argument("pdf_path", nargs="?", help="PDF file to analyse")
+    parser.add_argument("--generate", type=int, metavar="PAGES", help="Generate a synthetic PDF with this many pages")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per page (best is reported)")
+    args = parser.parse_args()
+    if not args.pdf_path and not args.generate:
+        parser.error("give a PDF path or --generate PAGES")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_path = args.pdf_path
+        if args.generate:
+            pdf_path = os.path.join(tmp_dir, "synthetic.pdf")
+            generate_pdf(pdf_path, args.generate)
+        old_times, old_texts = time_pages(pdf_path, separate_passes, args.repeat)
+        new_times, new_texts = time_pages(pdf_path, single_pass, args.repeat)
+        report("separate passes", old_times, duplicated_cells(pdf_path, old_texts))
+        report("single pass", new_times, duplicated_cells(pdf_path, new_texts))
+        old_analysis = sum(t[1] for t in old_times)
+        new_analysis = sum(t[1] for t in new_times)
+        old_total = old_analysis + sum(t[0] for t in old_times)
+        new_total = new_analysis + sum(t[0] for t in new_times)
+        print(f"analysis speedup {old_analysis / new_analysis:.2f}x   per-page speedup {old_total / new_total:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
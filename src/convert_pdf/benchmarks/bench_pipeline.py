@@ -0,0 +1,274 @@
+"""Per-stage timing and memory of the conversion pipeline over a generated PDF corpus.
+
+A local corpus is generated once (deterministically, so every run converts the same bytes):
+text-only, table-heavy, scanned (image-only), mixed text/scanned and very long documents.
+Every document is converted in a fresh process. Each LangGraph node (check_pdf_type,
+extract_text, process_to_markdown, save_markdown) is timed separately over several runs.
+One extra traced run records each node's peak Python allocations, and the process's peak
+RSS is recorded too. Results are written as JSON; pass an earlier results file to
+--compare to flag per-node regressions (exit status 1).
+
+OCR runs in its own process, so its memory is not included in the node figures. Documents
+over STREAM_MIN_PAGES are converted in streaming mode, where extraction happens lazily
+and its time is counted in process_to_markdown.
+
+Usage (from src/convert_pdf):
+    python -m benchmarks.bench_pipeline                        # needs reportlab
+    python -m benchmarks.bench_pipeline --kinds text tables --repeat 5 --output base.json
+    python -m benchmarks.bench_pipeline --compare base.json --threshold 0.1
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS = os.path.join(BENCH_DIR, "corpus")
+DEFAULT_RESULTS = os.path.join(BENCH_DIR, "results")
+# Node timings that differ by less than this are treated as noise when comparing runs
+MIN_REGRESSION_SECONDS = 0.005
+
+BODY = ("Net revenue rose in every region during the year, driven by higher volumes and stable prices. "
+        "Operating costs were held flat, and the savings were reinvested in the distribution network. ")
+
+
+def _scanned_image(token: str):
+    from PIL import Image, ImageDraw, ImageFont
+
+    image = Image.new("L", (1275, 1650), color=255)
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=40)
+    draw.text((110, 160), f"Scanned page {token}", fill=0, font=font)
+    for row in range(12):
+        draw.text((110, 300 + row * 80), "This paragraph was printed and scanned back in.", fill=0, font=font)
+    return image
+
+
+def _build(path: str, pages: int, page_story) -> None:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import PageBreak, SimpleDocTemplate
+
+    story = []
+    for number in range(1, pages + 1):
+        story.extend(page_story(number))
+        story.append(PageBreak())
+    # invariant=1 drops timestamps and random IDs so the corpus is byte-for-byte reproducible
+    SimpleDocTemplate(path, pagesize=A4, invariant=1).build(story)
+
+
+def _text_page(number: int) -> list:
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph
+
+    styles = getSampleStyleSheet()
+    return [
+        Paragraph(f"Chapter {number}: Annual Review", styles["Heading1"]),
+        Paragraph(BODY * 4, styles["BodyText"]),
+        Paragraph(f"{number}.1 Regional Results", styles["Heading2"]),
+        Paragraph(BODY * 3, styles["BodyText"]),
+        Paragraph("• Volumes increased in all markets", styles["BodyText"]),
+        Paragraph("• Prices were stable", styles["BodyText"]),
+        Paragraph(BODY * 2, styles["BodyText"]),
+    ]
+
+
+def _table_page(number: int) -> list:
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, Table
+
+    styles = getSampleStyleSheet()
+    grid = [("GRID", (0, 0), (-1, -1), 0.5, "black")]
+    story = [Paragraph(f"Schedule {number}", styles["Heading2"])]
+    for table in range(3):
+        rows = [["Account", "Q1", "Q2", "Q3", "Q4"]]
+        rows += [[f"Item {number}-{table}-{row}", *(str((number + row) * q) for q in range(1, 5))] for row in range(8)]
+        story.append(Table(rows, style=grid))
+        story.append(Paragraph("Figures are unaudited.", styles["BodyText"]))
+    return story
+
+
+def _scanned_page(number: int) -> list:
+    from reportlab.platypus import Image
+
+    png = io.BytesIO()
+    _scanned_image(f"S{number:04d}").save(png, "PNG")
+    png.seek(0)
+    return [Image(png, width=450, height=582)]
+
+
+def _mixed_page(number: int) -> list:
+    # Every fourth page is scanned, like a report with scanned appendices
+    return _scanned_page(number) if number % 4 == 0 else _text_page(number)
+
+
+# kind -> (page builder, pages at --scale 1)
+CORPUS = {
+    "text": (_text_page, 30),
+    "tables": (_table_page, 30),
+    "scanned": (_scanned_page, 4),
+    "mixed": (_mixed_page, 12),
+    "long": (_text_page, 400),
+}
+
+
+def ensure_corpus(corpus_dir: str, kinds: list, scale: float) -> list:
+    """Generate missing corpus documents; returns (kind, path, pages) for each."""
+    os.makedirs(corpus_dir, exist_ok=True)
+    documents = []
+    for kind in kinds:
+        builder, pages = CORPUS[kind]
+        pages = max(1, round(pages * scale))
+        path = os.path.join(corpus_dir, f"{kind}_{pages}.pdf")
+        if not os.path.exists(path):
+            print(f"Generating {path}")
+            _build(path, pages, builder)
+        documents.append((kind, path, pages))
+    return documents
+
+
+def peak_rss_mb() -> float:
+    import resource
+
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_nodes(pdf_path: str, traced: bool = False) -> dict:
+    """Run the pipeline's nodes in order like the workflow does, measuring each one."""
+    from src.pdf2md import PIPELINE_NODES, initial_state
+
+    state = initial_state(pdf_path)
+    nodes = {}
+    for name, node in PIPELINE_NODES:
+        if traced:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        state = {**state, **node(state)}
+        elapsed = time.perf_counter() - start
+        nodes[name] = {"seconds": elapsed}
+        if traced:
+            nodes[name]["peak_alloc_mb"] = (tracemalloc.get_traced_memory()[1] - before) / (1024 * 1024)
+    return {"nodes": nodes, "error": state["error"], "streaming": state["streaming"]}
+
+
+def child(pdf_path: str, repeat: int) -> dict:
+    """Measure one document (runs in a fresh process)."""
+    runs = [run_nodes(pdf_path) for _ in range(repeat)]
+    tracemalloc.start()
+    traced = run_nodes(pdf_path, traced=True)
+    tracemalloc.stop()
+    nodes = {}
+    for name in runs[0]["nodes"]:
+        seconds = [run["nodes"][name]["seconds"] for run in runs]
+        nodes[name] = {
+            "median_seconds": statistics.median(seconds),
+            "min_seconds": min(seconds),
+            "peak_alloc_mb": round(traced["nodes"][name]["peak_alloc_mb"], 2),
+        }
+    totals = [sum(node["seconds"] for node in run["nodes"].values()) for run in runs]
+    return {
+        "nodes": nodes,
+        "median_total_seconds": statistics.median(totals),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "streaming": runs[0]["streaming"],
+        "error": runs[0]["error"],
+    }
+
+
+def measure(kind: str, path: str, pages: int, repeat: int) -> dict:
+    command = [sys.executable, "-m", "benchmarks.bench_pipeline", "--child", path, "--repeat", str(repeat)]
+    output = subprocess.run(command, cwd=os.path.dirname(BENCH_DIR), capture_output=True, text=True, check=True)
+    result = json.loads(output.stdout.strip().splitlines()[-1])
+    return {"name": os.path.basename(path), "kind": kind, "pages": pages, "bytes": os.path.getsize(path), **result}
+
+
+def environment() -> dict:
+    from src import pdf2md
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        **pdf2md.conversion_settings(),
+        "extract_workers": pdf2md.EXTRACT_WORKERS,
+        "stream_min_pages": pdf2md.STREAM_MIN_PAGES,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> int:
+    """Print per-node ratios against a baseline run; returns the number of regressions."""
+    previous = {document["name"]: document for document in baseline["documents"]}
+    regressions = 0
+    print(f"\nCompared with {baseline['created']}:")
+    for document in current["documents"]:
+        old = previous.get(document["name"])
+        if old is None or old["error"] or document["error"]:
+            continue
+        for name, node in document["nodes"].items():
+            old_node = old["nodes"].get(name)
+            if old_node is None:
+                continue
+            new_seconds, old_seconds = node["median_seconds"], old_node["median_seconds"]
+            ratio = new_seconds / old_seconds if old_seconds else float("inf")
+            regressed = ratio > 1 + threshold and new_seconds - old_seconds > MIN_REGRESSION_SECONDS
+            regressions += regressed
+            print(f"  {document['name']:<18} {name:<20} {old_seconds:8.3f}s -> {new_seconds:8.3f}s "
+                  f"{ratio:6.2f}x{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each stage of the conversion pipeline")
+    parser.add_argument("--kinds", nargs="+", choices=list(CORPUS), default=list(CORPUS))
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply the page count of every document")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per document (median is reported)")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="Directory holding the generated corpus")
+    parser.add_argument("--output", help="Results JSON file (default: benchmarks/results/pipeline_<time>.json)")
+    parser.add_argument("--compare", metavar="RESULTS_JSON", help="Earlier results to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Slowdown ratio counted as a regression")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child, args.repeat)))
+        return
+
+    documents = ensure_corpus(args.corpus, args.kinds, args.scale)
+    created = datetime.now(timezone.utc)
+    results = {"created": created.isoformat(timespec="seconds"), "environment": environment(), "documents": []}
+    print(f"{'document':<18} {'check':>8} {'extract':>8} {'process':>8} {'save':>8} {'total s':>8} {'RSS MB':>7}")
+    for kind, path, pages in documents:
+        document = measure(kind, path, pages, args.repeat)
+        results["documents"].append(document)
+        if document["error"]:
+            print(f"{document['name']:<18} error: {document['error']}")
+            continue
+        columns = " ".join(f"{node['median_seconds']:>8.3f}" for node in document["nodes"].values())
+        streaming = "  (streaming)" if document["streaming"] else ""
+        print(f"{document['name']:<18} {columns} {document['median_total_seconds']:>8.3f} "
+              f"{document['peak_rss_mb']:>7.1f}{streaming}")
+
+    output = args.output or os.path.join(DEFAULT_RESULTS, f"pipeline_{created:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(json.load(f), results, args.threshold)
+        if regressions:
+            print(f"{regressions} node timing(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
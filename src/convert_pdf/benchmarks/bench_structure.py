@@ -0,0 +1,127 @@
+"""Throughput and accuracy of font-statistics structure detection against the regex heuristics.
+
+The previous process_to_markdown classified each line of the layout text on its own with
+isupper()/istitle() and regular expressions. This times both stages on the same document,
+replicated up to 1000+ pages to show that the new stage stays linear, and counts headings
+found against the headings the synthetic document really contains.
+
+Usage (from src/convert_pdf):
+    python -m benchmarks.bench_structure --pages 10 --scale 1 10 100
+"""
+import argparse
+import os
+import re
+import tempfile
+import time
+
+import pdfplumber
+
+from src.pdf2md import extract_pages
+from src.structure import TextLine, blocks_to_markdown
+
+
+def regex_markdown(raw_text: str) -> str:
+    """The previous process_to_markdown, kept here as the baseline."""
+    text = re.sub(r'\n\s*\n+', '\n\n', raw_text.strip())
+    lines = text.split('\n')
+    markdown_lines = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if len(line) < 60 and (line.isupper() or line.istitle() or re.match(r'^\d+\.\s+', line)):
+            markdown_lines.append(f"## {line}")
+        elif re.match(r'^\s*[-*•]\s+|^\d+\.\s+', line):
+            markdown_lines.append(line)
+        else:
+            markdown_lines.append(line)
+    return '\n'.join(markdown_lines)
+
+
+def generate_pdf(path: str, pages: int) -> set:
+    """Write a report with chapter/section headings, bold run-in titles, lists and body text.
+
+    Returns the set of heading texts the document contains.
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate
+
+    styles = getSampleStyleSheet()
+    headings = set()
+    story = []
+    body = ("The Survey Team Visited Every Site Listed Below. Measurements were taken twice and "
+            "averaged, and any reading outside the expected range was repeated the following day. ")
+    for chapter in range(1, pages + 1):
+        title = f"Chapter {chapter}: Field Results"
+        headings.add(title)
+        story.append(Paragraph(title, styles["Heading1"]))
+        for section in range(1, 3):
+            name = f"{chapter}.{section} Site Observations"
+            headings.add(name)
+            story.append(Paragraph(name, styles["Heading2"]))
+            story.append(Paragraph(body * 3, styles["BodyText"]))
+            story.append(Paragraph("<b>Summary Of Findings</b>", styles["BodyText"]))
+            headings.add("Summary Of Findings")
+            for item in range(1, 4):
+                story.append(Paragraph(f"• Finding {item} Was Confirmed By Two Readers", styles["BodyText"]))
+            story.append(Paragraph("NOTE", styles["BodyText"]))
+            story.append(Paragraph(body * 2, styles["BodyText"]))
+        story.append(PageBreak())
+    SimpleDocTemplate(path, pagesize=A4).build(story)
+    return headings
+
+
+def replicate(blocks: list, raw_text: str, pages: int, factor: int) -> tuple:
+    """Repeat a document factor times, renumbering pages so the copies stay separate."""
+    copies = []
+    for copy in range(factor):
+        offset = copy * pages
+        copies.extend(block._replace(page=block.page + offset) for block in blocks)
+    return copies, raw_text * factor
+
+
+def heading_counts(markdown: str, expected: set) -> tuple:
+    found = [line.lstrip("#").strip() for line in markdown.splitlines() if line.startswith("#")]
+    correct = sum(1 for heading in found if heading in expected)
+    return correct, len(found) - correct
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark structure detection throughput")
+    parser.add_argument("--pages", type=int, default=10, help="Pages in the generated document")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10, 100],
+                        help="Replication factors (document pages x factor)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_path = os.path.join(tmp_dir, "report.pdf")
+        expected = generate_pdf(pdf_path, args.pages)
+        blocks = extract_pages(pdf_path)
+        with pdfplumber.open(pdf_path) as pdf:
+            pages = len(pdf.pages)
+            raw_text = "".join(page.extract_text(layout=True) + "\n" for page in pdf.pages)
+
+    line_count = sum(1 for block in blocks if isinstance(block, TextLine))
+    old_correct, old_wrong = heading_counts(regex_markdown(raw_text), expected)
+    new_correct, new_wrong = heading_counts(blocks_to_markdown(blocks), expected)
+    expected_count = sum(1 for block in blocks if isinstance(block, TextLine) and block.text in expected)
+    print(f"headings in document: {expected_count}")
+    print(f"regex         correct {old_correct:4d}   mislabelled {old_wrong:4d}")
+    print(f"font stats    correct {new_correct:4d}   mislabelled {new_wrong:4d}")
+    print()
+    print(f"{'pages':>6} {'lines':>8} {'regex s':>9} {'fonts s':>9} {'fonts lines/s':>14}")
+    for factor in args.scale:
+        scaled_blocks, scaled_text = replicate(blocks, raw_text, pages, factor)
+        start = time.perf_counter()
+        regex_markdown(scaled_text)
+        regex_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        blocks_to_markdown(scaled_blocks)
+        font_seconds = time.perf_counter() - start
+        lines = line_count * factor
+        print(f"{pages * factor:>6} {lines:>8} {regex_seconds:>9.3f} {font_seconds:>9.3f} {lines / font_seconds:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Measure server peak RSS while uploading PDFs of increasing size (Linux only).
+
+For every size a fresh server process is started, one upload is streamed to
+/mcp/upload_pdf_tool with chunked transfer encoding, and the server's peak RSS
+(VmHWM) is read from /proc. With streaming uploads the peak stays flat no matter
+how large the file is.
+
+Usage (from src/convert_pdf):
+    python -m benchmarks.bench_upload_memory --sizes-mb 16 64 256
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+
+import requests
+
+CHUNK = 1024 * 1024
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def peak_rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError("VmHWM not available")
+
+
+def multipart_body(boundary: str, size: int):
+    """Yield a multipart/form-data body carrying a fake PDF of the given size."""
+    yield (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="delete_after"\r\n\r\ntrue\r\n'
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="bench_{size}.pdf"\r\n'
+        f"Content-Type: application/pdf\r\n\r\n"
+    ).encode()
+    block = b"%PDF-1.7\n" + b"0" * (CHUNK - 9)
+    sent = 0
+    while sent < size:
+        data = block[: min(CHUNK, size - sent)]
+        sent += len(data)
+        yield data
+    yield f"\r\n--{boundary}--\r\n".encode()
+
+
+def measure(size_mb: int) -> tuple:
+    port = free_port()
+    env = dict(os.environ, MAX_UPLOAD_BYTES=str((size_mb + 1) * CHUNK))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "--factory", "src.convert_mcp:create_app", "--port", str(port),
+         "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        url = f"http://127.0.0.1:{port}/mcp/upload_pdf_tool"
+        for _ in range(100):
+            try:
+                requests.get(f"http://127.0.0.1:{port}/", timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.2)
+        baseline = peak_rss_mb(server.pid)
+        boundary = uuid.uuid4().hex
+        start = time.perf_counter()
+        response = requests.post(
+            url,
+            data=multipart_body(boundary, size_mb * CHUNK),
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+        )
+        elapsed = time.perf_counter() - start
+        response.raise_for_status()
+        return baseline, peak_rss_mb(server.pid), elapsed
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark upload memory usage")
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[16, 64, 256])
+    args = parser.parse_args()
+    print(f"{'size MB':>8} {'idle RSS MB':>12} {'peak RSS MB':>12} {'seconds':>8}")
+    for size_mb in args.sizes_mb:
+        baseline, peak, elapsed = measure(size_mb)
+        print(f"{size_mb:>8} {baseline:>12.1f} {peak:>12.1f} {elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Check that streaming conversion keeps peak memory under a ceiling regardless of page count (Linux only).
+
+Synthetic PDFs of increasing length (text, headings and a table on every page) are
+converted in a fresh process each. Files in RAM-backed /dev/shm do not count towards RSS,
+so each conversion gets its own OCR_SCRATCH_DIR there, sampled while it runs, and peak RSS
+plus peak scratch usage is compared with --max-rss-mb. The script exits with status 1 if
+any conversion goes over the ceiling, so it can run as a check in CI.
+
+Usage (from src/convert_pdf):
+    python -m benchmarks.check_stream_memory --pages 100 500 2000 --max-rss-mb 300
+    python -m benchmarks.check_stream_memory --pages 100 400 --baseline   # also run without streaming
+    python -m benchmarks.check_stream_memory --pages 2000 --workers 4     # stream from the process pool
+    python -m benchmarks.check_stream_memory --pages 500 --scanned-every 5  # OCR every 5th page
+"""
+import argparse
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# RAM-backed filesystem the OCR scratch directories are created in, as in the server
+SHM_DIR = "/dev/shm"
+# How often the scratch directory is measured while a conversion runs
+SAMPLE_SECONDS = 0.05
+
+
+def scanned_page_image(number: int) -> io.BytesIO:
+    """A page of text rendered as a PNG, with no text layer, so it has to be OCRed."""
+    from PIL import Image, ImageDraw
+
+    image = Image.new("L", (1240, 1754), 255)
+    draw = ImageDraw.Draw(image)
+    for line in range(40):
+        draw.text((100, 100 + line * 40), f"Scanned page {number}, line {line + 1}: revenue grew in every region.", fill=0)
+    png = io.BytesIO()
+    image.save(png, "PNG")
+    png.seek(0)
+    return png
+
+
+def generate_pdf(path: str, pages: int, scanned_every: int = 0) -> None:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Image, PageBreak, Paragraph, SimpleDocTemplate, Table
+
+    styles = getSampleStyleSheet()
+    body = "Revenue grew in every region while operating costs stayed flat across the period. " * 12
+    story = []
+    for number in range(1, pages + 1):
+        if scanned_every and number % scanned_every == 0:
+            story.append(Image(scanned_page_image(number), width=A4[0] - 160, height=A4[1] - 160))
+            story.append(PageBreak())
+            continue
+        story.append(Paragraph(f"Section {number}", styles["Heading1"]))
+        story.append(Paragraph(body, styles["BodyText"]))
+        story.append(Table([["Region", "Q1", "Q2"], ["North", str(number), str(number * 2)]],
+                           style=[("GRID", (0, 0), (-1, -1), 0.5, "black")]))
+        story.append(Paragraph(body, styles["BodyText"]))
+        story.append(PageBreak())
+    SimpleDocTemplate(path, pagesize=A4).build(story)
+
+
+def dir_bytes(path: str) -> int:
+    """Total size of the files under path; files may vanish while it is walked."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.stat(os.path.join(root, name)).st_blocks * 512
+            except OSError:
+                pass
+    return total
+
+
+def convert(pdf_path: str, streaming: bool, workers: int = 1) -> tuple:
+    """Convert in a child process; returns (peak RSS MB, peak scratch MB, seconds)."""
+    shm = SHM_DIR if os.path.isdir(SHM_DIR) and os.access(SHM_DIR, os.W_OK) else None
+    with tempfile.TemporaryDirectory(prefix="scratch_", dir=shm) as scratch_dir:
+        env = dict(os.environ, STREAM_MIN_PAGES="1" if streaming else "0", EXTRACT_WORKERS=str(workers),
+                   OCR_SCRATCH_DIR=scratch_dir)
+        code = "import sys; from src.pdf2md import convert_pdf_to_markdown; print(convert_pdf_to_markdown(sys.argv[1]))"
+        peak_scratch = 0
+        done = threading.Event()
+
+        def sample():
+            nonlocal peak_scratch
+            while not done.wait(SAMPLE_SECONDS):
+                peak_scratch = max(peak_scratch, dir_bytes(scratch_dir))
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        start = time.perf_counter()
+        child = subprocess.Popen([sys.executable, "-c", code, pdf_path], env=env, stdout=subprocess.PIPE, text=True)
+        sampler.start()
+        output = child.stdout.read()
+        # wait4 reports the peak RSS of this child, or of the largest of its extraction workers
+        # (ru_maxrss is in KiB on Linux)
+        _, status, usage = os.wait4(child.pid, 0)
+        child.returncode = os.waitstatus_to_exitcode(status)
+        elapsed = time.perf_counter() - start
+        done.set()
+        sampler.join()
+    if child.returncode != 0 or "'success'" not in output:
+        raise RuntimeError(f"Conversion of {pdf_path} failed: {output.strip()}")
+    return usage.ru_maxrss / 1024, peak_scratch / (1024 * 1024), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check streaming conversion memory")
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--max-rss-mb", type=float, default=300,
+                        help="Ceiling on peak RSS plus peak /dev/shm scratch for streaming conversions")
+    parser.add_argument("--baseline", action="store_true", help="Also convert with streaming disabled")
+    parser.add_argument("--workers", type=int, default=1, help="EXTRACT_WORKERS for the conversions")
+    parser.add_argument("--scanned-every", type=int, default=0,
+                        help="Make every Nth page an image that needs OCR (needs Pillow and Tesseract)")
+    args = parser.parse_args()
+
+    failures = 0
+    print(f"{'pages':>6} {'mode':>10} {'peak RSS MB':>12} {'scratch MB':>11} {'seconds':>8}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for pages in args.pages:
+            pdf_path = os.path.join(tmp_dir, f"stream_{pages}.pdf")
+            generate_pdf(pdf_path, pages, args.scanned_every)
+            modes = [True, False] if args.baseline else [True]
+            for streaming in modes:
+                peak, scratch, elapsed = convert(pdf_path, streaming, args.workers)
+                over = streaming and peak + scratch > args.max_rss_mb
+                failures += over
+                label = "streaming" if streaming else "in-memory"
+                print(f"{pages:>6} {label:>10} {peak:>12.1f} {scratch:>11.1f} {elapsed:>8.1f}"
+                      f"{'  OVER CEILING' if over else ''}")
+    if failures:
+        print(f"{failures} streaming conversion(s) exceeded {args.max_rss_mb:.0f} MB")
+        sys.exit(1)
+    print(f"All streaming conversions stayed under {args.max_rss_mb:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
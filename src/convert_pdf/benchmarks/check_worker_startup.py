@@ -0,0 +1,66 @@
+"""Check that OCR/extraction worker processes do not build the server's state.
+
+Started with "python -m src.convert_mcp", the server module is re-run as __mp_main__
+in every worker of MP_CONTEXT. This script makes src.convert_mcp the main module the
+same way, starts a pool of workers and asks each one what that re-run left behind:
+the job queue, conversion cache and file registry must not exist and no threads may
+have been started. Exits with status 1 otherwise, so it can run as a check in CI.
+
+Usage (from src/convert_pdf):
+    python -m benchmarks.check_worker_startup --workers 3
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Server state that create_app() builds and workers must never build
+SERVER_STATE = ("job_queue", "conversion_cache", "file_registry")
+
+
+def probe(_=None) -> dict:
+    """Runs in a worker: report the re-run main module and the state it created."""
+    main = sys.modules.get("__mp_main__")
+    return {
+        "pid": os.getpid(),
+        "main": getattr(getattr(main, "__spec__", None), "name", None),
+        "state": [name for name in SERVER_STATE if getattr(main, name, None) is not None],
+        "threads": threading.active_count(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check worker start-up for server state")
+    parser.add_argument("--workers", type=int, default=3)
+    args = parser.parse_args()
+
+    import src.convert_mcp as server
+    from src.pdf2md import MP_CONTEXT
+    # Pickled by its importable name: in the workers __main__ is src.convert_mcp, not this script
+    from benchmarks.check_worker_startup import probe as worker_probe
+
+    # What "python -m src.convert_mcp" leaves in __main__: workers re-run the module by this name
+    sys.modules["__main__"].__spec__ = server.__spec__
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=MP_CONTEXT) as pool:
+        reports = list(pool.map(worker_probe, range(args.workers * 4)))
+    elapsed = time.perf_counter() - start
+
+    failures = 0
+    print(f"{'pid':>8} {'main module':>16} {'threads':>8}  state")
+    for report in {report["pid"]: report for report in reports}.values():
+        bad = report["main"] != server.__spec__.name or report["state"] or report["threads"] > 1
+        failures += bool(bad)
+        state = ", ".join(report["state"]) or "-"
+        print(f"{report['pid']:>8} {str(report['main']):>16} {report['threads']:>8}  {state}{'  FAIL' if bad else ''}")
+    print(f"Pool started and answered in {elapsed:.2f}s")
+    if failures:
+        print(f"{failures} worker(s) did not re-run {server.__spec__.name} cleanly or built server state")
+        sys.exit(1)
+    print("No worker built server state")
+
+
+if __name__ == "__main__":
+    main()
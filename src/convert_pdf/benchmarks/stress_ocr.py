@@ -0,0 +1,80 @@
+"""Stress concurrent OCR: convert dozens of scanned PDFs at once and verify every output.
+
+Each generated PDF is an image-only page carrying a unique token. After converting them
+all concurrently, every Markdown output must contain its own token (and no other), and
+no OCR scratch directories may be left behind.
+
+Usage (from src/convert_pdf):
+    python -m benchmarks.stress_ocr --documents 48 --concurrency 12
+"""
+import argparse
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageDraw, ImageFont
+
+from src import pdf2md
+from src.pdf2md import convert_pdf_to_markdown
+
+
+def make_scanned_pdf(path: str, token: str) -> None:
+    """Render token onto a blank page and save it as an image-only PDF."""
+    image = Image.new("L", (1700, 2200), color=255)
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=72)
+    draw.text((150, 300), f"Document {token}", fill=0, font=font)
+    draw.text((150, 500), "This page was scanned.", fill=0, font=font)
+    image.save(path, "PDF", resolution=200.0)
+
+
+def convert(path: str, token: str) -> tuple:
+    result = convert_pdf_to_markdown(path)
+    if result["status"] != "success":
+        return token, False, result["message"]
+    with open(result["markdown_path"], encoding="utf-8") as f:
+        markdown = f.read()
+    os.remove(result["markdown_path"])
+    found = set(re.findall(r"TK\d{4}", markdown))
+    return token, found == {token}, f"found {sorted(found)}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert many scanned PDFs concurrently")
+    parser.add_argument("--documents", type=int, default=48)
+    parser.add_argument("--concurrency", type=int, default=12)
+    args = parser.parse_args()
+
+    scratch_before = {name for name in os.listdir(pdf2md.SCRATCH_DIR) if name.startswith("ocr_")}
+    with tempfile.TemporaryDirectory() as workdir:
+        jobs = []
+        for i in range(args.documents):
+            token = f"TK{i:04d}"
+            path = os.path.join(workdir, f"stress_{token}.pdf")
+            make_scanned_pdf(path, token)
+            jobs.append((path, token))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            results = list(executor.map(lambda job: convert(*job), jobs))
+        elapsed = time.perf_counter() - start
+
+    failures = [(token, detail) for token, ok, detail in results if not ok]
+    scratch_after = {name for name in os.listdir(pdf2md.SCRATCH_DIR) if name.startswith("ocr_")}
+    leaked = scratch_after - scratch_before
+
+    print(f"Converted {len(results)} scanned PDFs with concurrency {args.concurrency} in {elapsed:.1f}s")
+    print(f"Scratch directory: {pdf2md.SCRATCH_DIR}")
+    for token, detail in failures:
+        print(f"  FAIL {token}: {detail}")
+    if leaked:
+        print(f"  Leaked scratch directories: {sorted(leaked)}")
+    if failures or leaked:
+        raise SystemExit(1)
+    print("All outputs correct, no scratch files left behind")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from .output_store import OutputStore
+from .pdf2md import PROJECT_ROOT
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = "/app/cache" if os.getenv("DOCKER_ENV") else os.path.join(PROJECT_ROOT, "cache")
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+
+
+def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Return the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_cache_key(content_hash: str, settings: dict) -> str:
+    """Combine the PDF content hash with the conversion settings that affect the output."""
+    payload = content_hash + json.dumps(settings, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ConversionCache:
+    """Persistent index from cache key to the converted Markdown's artifact in the output store.
+
+    The Markdown itself lives only in the output store, so entries last as long as the
+    store's GC keeps their artifact (OUTPUT_MAX_BYTES); an entry whose artifact was
+    deleted is dropped on lookup.
+    """
+
+    def __init__(self, store: OutputStore, cache_dir: str = CACHE_DIR):
+        self.store = store
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(cache_dir, "index.db"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " file_name TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return the cached artifact ({"file_name", "path", "size"}) for key, or None on a miss."""
+        with self._lock:
+            row = self._db.execute("SELECT file_name, size FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None and not os.path.exists(self.store.path(row[0])):
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._db.commit()
+                self.stale += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            self.hits += 1
+        file_name, size = row
+        # Keep the artifact from looking unused to the store's GC
+        self.store.touch(file_name)
+        return {"file_name": file_name, "path": self.store.path(file_name), "size": size}
+
+    def put(self, key: str, markdown_path: str) -> None:
+        """Record the output-store artifact holding the Markdown converted for key."""
+        file_name = os.path.basename(markdown_path)
+        size = os.path.getsize(markdown_path)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, file_name, size, created_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, file_name, size, now, now),
+            )
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, total = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": total,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
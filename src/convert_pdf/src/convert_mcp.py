@@ -1,80 +1,341 @@
-from .pdf2md import convert_pdf_to_markdown, OUTPUT_DIR, UPLOAD_DIR, PROJECT_ROOT
+from .pdf2md import (
+    convert_pdf_to_markdown, conversion_settings, output_store, MP_CONTEXT, OUTPUT_DIR, UPLOAD_DIR, TEMP_DIR,
+)
+from .jobs import JobQueue, QueueFullError
+from .cache import CACHE_ENABLED, ConversionCache, hash_file, make_cache_key
+from .uploads import UploadRejected, receive_pdf_batch, receive_pdf_upload
+from .registry import FileRegistry
+from .output_files import OutputFiles
+from .profiling import ProfilingBusy, RequestProfile, profiling_allowed, unprofiled_work
+from .metrics import (
+    CONVERSION_SECONDS, CONVERSIONS_IN_FLIGHT, ERRORS, UPLOAD_BYTES, metrics_endpoint, register_stats,
+)
 from urllib.parse import quote
+import asyncio
 import os
+import shutil
+import tempfile
+import time
+from collections import deque
 import uvicorn
 import argparse
 from mcp.server.fastmcp import FastMCP
-from starlette.staticfiles import StaticFiles
 import logging
 import json
+from typing import Optional
 from starlette.requests import Request
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, StreamingResponse
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-PROCESSED_LIST = "/app/processed_files.json" if os.getenv("DOCKER_ENV") else os.path.join(PROJECT_ROOT, "processed_files.json")
+# Started with "python -m", this module is re-run as __mp_main__ in every OCR/extraction worker,
+# so importing it must stay cheap and side-effect free: the server state is built by create_app().
+# Preloading its imports into the fork server keeps that re-run from importing them again
+MP_CONTEXT.set_forkserver_preload([convert_pdf_to_markdown.__module__, "mcp.server.fastmcp", "uvicorn"])
 
 # Initialize FastMCP server
 mcp = FastMCP()
 
-app = mcp.streamable_http_app()
+# Background worker pool for conversions, so a slow PDF never blocks other MCP calls
+job_queue: Optional[JobQueue] = None
+
+# Content-addressed cache of finished conversions, keyed by PDF hash + settings (None when disabled)
+conversion_cache: Optional[ConversionCache] = None
+
+# Indexed registry of uploaded files and their conversion status
+file_registry: Optional[FileRegistry] = None
 
-# Use @mcp.tool() will cost tokens of llm model and inefficient. API for upload pdf file is more efficient.
-@app.route("/mcp/upload_pdf_tool", methods=["POST"])
 async def upload_pdf_tool(request: Request) -> JSONResponse:
     """Handles raw binary PDF file uploads."""
     logger.info("upload_pdf_tool endpoint called")
     
+    file_name = None
     try:
-        # Parse multipart form data
-        form = await request.form()
-        file = form.get("file")
-        delete_after = form.get("delete_after", "false").lower() == "true"
-        
-        if not file:
-            logger.error("No file provided in upload")
-            return JSONResponse({"status": "error", "message": "No file provided"}, status_code=400)
-        
-        file_name = file.filename
-        if not file_name.lower().endswith(".pdf"):
-            logger.error(f"Invalid file type for {file_name}: only PDF files are allowed")
-            return JSONResponse({"status": "error", "message": "Only PDF files are allowed"}, status_code=400)
-        
-        file_path = os.path.join(UPLOAD_DIR, file_name)
-        
-        # Save the file
-        with open(file_path, "wb") as f:
-            f.write(await file.read())
+        # Stream the multipart body straight to disk, hashing and validating as it arrives
+        upload = await receive_pdf_upload(request, UPLOAD_DIR)
+        UPLOAD_BYTES.inc(upload["size"])
+        file_name = upload["filename"]
+        file_path = upload["path"]
+        delete_after = upload["fields"].get("delete_after", "false").lower() == "true"
         logger.info(f"File '{file_name}' saved to {file_path}")
         
-        # Update processed files list
-        with open(PROCESSED_LIST, "r+") as f_list:
-            data = json.load(f_list)
-            if file_name not in data:
-                data.append(file_name)
-                f_list.seek(0)
-                json.dump(data, f_list, indent=4)
-                f_list.truncate()
+        # Record the upload in the processed files registry
+        file_registry.record_upload(file_path, upload["sha256"], upload["size"])
         logger.info(f"'{file_name}' added to processed list")
         
         if delete_after:
             os.remove(file_path)
+            file_registry.set_status(file_path, "deleted")
             logger.info(f"File '{file_name}' deleted after processing")
         
-        return JSONResponse({
+        response = {
             "status": "uploaded",
             "filename": file_name,
             "path": file_path,
+            "size": upload["size"],
+            "sha256": upload["sha256"],
             "delete_after": delete_after
-        })
+        }
+        if "source_name" in upload:
+            response["source_name"] = upload["source_name"]
+        return JSONResponse(response)
+    except UploadRejected as e:
+        ERRORS.labels("upload").inc()
+        logger.error(f"Upload rejected: {e.message}")
+        return JSONResponse({"status": "error", "message": e.message}, status_code=e.status_code)
     except Exception as e:
+        ERRORS.labels("upload").inc()
         logger.exception(f"Error during upload_pdf_tool execution for {file_name}: {str(e)}")
         return JSONResponse({"status": "error", "message": f"Failed to upload file: {str(e)}"}, status_code=500)
 
+async def upload_convert_tool(request: Request):
+    """Upload one PDF and convert it in the same request.
+
+    Responds with the Markdown itself (text/markdown, streamed from the output store) or,
+    with ?format=json, the conversion result with the Markdown inlined. The upload is kept
+    in UPLOAD_DIR and registered only with ?persist=true; otherwise it is staged in a private
+    directory under TEMP_DIR and deleted once its conversion has finished.
+    """
+    logger.info("upload_convert_tool endpoint called")
+    # Options come from the query string because they must be known before the body is read
+    persist = request.query_params.get("persist", "false").lower() == "true"
+    as_json = request.query_params.get("format", "markdown").lower() == "json"
+    # Staged on disk rather than in /dev/shm: uploads can be MAX_UPLOAD_BYTES each and are
+    # received before the job queue admits them, so their number is not bounded
+    scratch_dir = None if persist else tempfile.mkdtemp(prefix="convert_", dir=TEMP_DIR)
+    job_id = None
+    try:
+        try:
+            upload = await receive_pdf_upload(request, UPLOAD_DIR if persist else scratch_dir)
+        except UploadRejected as e:
+            ERRORS.labels("upload").inc()
+            logger.error(f"Upload rejected: {e.message}")
+            return JSONResponse({"status": "error", "message": e.message}, status_code=e.status_code)
+        UPLOAD_BYTES.inc(upload["size"])
+        if persist:
+            file_registry.record_upload(upload["path"], upload["sha256"], upload["size"])
+
+        try:
+            job_id = job_queue.submit(run_conversion, upload["path"], file_hash=upload["sha256"], record=persist)
+        except QueueFullError as e:
+            logger.error(str(e))
+            return JSONResponse({"status": "error", "message": str(e)}, status_code=503)
+    except Exception as e:
+        ERRORS.labels("upload").inc()
+        logger.exception(f"Error during upload_convert_tool execution: {str(e)}")
+        return JSONResponse({"status": "error", "message": f"Failed to convert file: {str(e)}"}, status_code=500)
+    finally:
+        # Until a job is queued (or if the client disconnects during the upload) the scratch
+        # directory is this handler's to remove
+        if scratch_dir is not None and job_id is None:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    future = job_queue.future(job_id)
+    if scratch_dir is not None:
+        # From here on the job owns it: removed when the conversion ends, even if the client
+        # has disconnected and this handler was cancelled in the meantime
+        future.add_done_callback(lambda _: shutil.rmtree(scratch_dir, ignore_errors=True))
+    # Shielded so a disconnect does not cancel the queued job (it would stay "queued" forever)
+    result = await asyncio.shield(asyncio.wrap_future(future))
+
+    if result["status"] != "success":
+        return JSONResponse({"filename": upload["filename"], **result}, status_code=422)
+    if as_json:
+        with open(result["markdown_path"], encoding="utf-8") as f:
+            markdown = f.read()
+        return JSONResponse({"filename": upload["filename"], "sha256": upload["sha256"], **result,
+                             "persisted": persist, "markdown": markdown})
+    # Open before responding, so a store GC running meanwhile cannot pull the file away
+    markdown_file = open(result["markdown_path"], "rb")
+    headers = {"X-Download-Url": result["download_url"], "X-Cached": str(result["cached"]).lower()}
+    return StreamingResponse(iter_file(markdown_file), media_type="text/markdown; charset=utf-8", headers=headers)
+
+def iter_file(f, chunk_size: int = 64 * 1024):
+    """Yield a file's contents in chunks and close it at the end."""
+    with f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            yield chunk
+
+async def batch_convert_tool(request: Request):
+    """Upload many PDFs (repeated "file" fields or a zip archive) and convert them concurrently.
+
+    Responds with newline-delimited JSON: one line per file as soon as its conversion
+    finishes, followed by a summary line.
+    """
+    logger.info("batch_convert_tool endpoint called")
+    # Each batch gets its own directory, so files of concurrent batches or uploads cannot replace each other
+    batch_dir = tempfile.mkdtemp(prefix="batch_", dir=UPLOAD_DIR)
+    try:
+        batch = await receive_pdf_batch(request, batch_dir)
+    except UploadRejected as e:
+        ERRORS.labels("batch_upload").inc()
+        logger.error(f"Batch upload rejected: {e.message}")
+        shutil.rmtree(batch_dir, ignore_errors=True)
+        return JSONResponse({"status": "error", "message": e.message}, status_code=e.status_code)
+    except Exception as e:
+        ERRORS.labels("batch_upload").inc()
+        logger.exception(f"Error during batch_convert_tool upload: {str(e)}")
+        shutil.rmtree(batch_dir, ignore_errors=True)
+        return JSONResponse({"status": "error", "message": f"Failed to upload files: {str(e)}"}, status_code=500)
+    
+    delete_after = batch["fields"].get("delete_after", "false").lower() == "true"
+    for upload in batch["files"]:
+        if "error" in upload:
+            ERRORS.labels("batch_upload").inc()
+        else:
+            UPLOAD_BYTES.inc(upload["size"])
+            file_registry.record_upload(upload["path"], upload["sha256"], upload["size"])
+    
+    return StreamingResponse(stream_batch_results(batch["files"], delete_after, batch_dir),
+                             media_type="application/x-ndjson")
+
+async def stream_batch_results(uploads: list, delete_after: bool, batch_dir: Optional[str] = None):
+    """Feed uploads to the job queue a few at a time and yield each result as it completes.
+
+    Each file's registry entry is keyed by its path inside batch_dir, so it cannot collide
+    with other batches or standalone uploads of the same name. With delete_after, each PDF
+    is removed (and marked deleted) once converted, and batch_dir once it is empty.
+    """
+    # Keep only a bounded number of this batch's jobs queued, so other clients are not starved
+    max_in_flight = max(1, job_queue.max_workers * 2)
+    pending = {}
+    counts = {"success": 0, "error": 0}
+    queue = deque(uploads)
+    
+    def line(upload: dict, result: dict) -> str:
+        counts["success" if result["status"] == "success" else "error"] += 1
+        fields = {key: upload[key] for key in ("filename", "source_name", "path", "sha256") if key in upload}
+        return json.dumps({**fields, **result}) + "\n"
+    
+    while queue or pending:
+        while queue and len(pending) < max_in_flight:
+            upload = queue[0]
+            if "error" in upload:
+                queue.popleft()
+                yield line(upload, {"status": "error", "message": upload["error"]})
+                continue
+            try:
+                job_id = job_queue.submit(run_conversion, upload["path"])
+            except QueueFullError:
+                if not pending:
+                    await asyncio.sleep(0.5)
+                break
+            queue.popleft()
+            pending[asyncio.wrap_future(job_queue.future(job_id))] = (upload, job_id)
+        if not pending:
+            continue
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for future in done:
+            upload, job_id = pending.pop(future)
+            if delete_after and os.path.exists(upload["path"]):
+                os.remove(upload["path"])
+                file_registry.set_status(upload["path"], "deleted")
+            yield line(upload, {**future.result(), "job_id": job_id})
+    
+    if delete_after and batch_dir is not None:
+        try:
+            os.rmdir(batch_dir)
+        except OSError:
+            pass
+    yield json.dumps({"status": "done", "total": len(uploads), **counts}) + "\n"
+
+def build_download_url(markdown_path: str) -> str:
+    """Build the public /output URL for a converted Markdown file."""
+    filename = os.path.basename(markdown_path)
+    host = os.getenv("PUBLIC_HOST", "localhost")  # Use "localhost" for external access
+    port = os.getenv("PORT", "8001")
+    return f"http://{host}:{port}/output/{quote(filename)}"
+
+def run_conversion(pdf_path: str, profile: bool = False, file_hash: Optional[str] = None,
+                   record: bool = True) -> dict:
+    """Run the conversion and record its outcome in the file registry (executed on a worker thread).
+
+    Pass file_hash when the SHA-256 is already known to skip rehashing for the cache lookup,
+    and record=False for files that were never registered (one-shot conversions).
+    """
+    if record:
+        file_registry.set_status(pdf_path, "converting")
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        with CONVERSIONS_IN_FLIGHT.track_inprogress():
+            if profile:
+                result = profile_conversion(pdf_path)
+            else:
+                # Held back while a profiled conversion runs alone
+                with unprofiled_work():
+                    result = convert_with_cache(pdf_path, file_hash=file_hash)
+        if result["status"] == "success":
+            outcome = "cached" if result.get("cached") else "success"
+    finally:
+        CONVERSION_SECONDS.labels(outcome).observe(time.perf_counter() - start)
+    if not record:
+        return result
+    if result["status"] == "success":
+        file_registry.set_status(pdf_path, "converted", markdown_path=result["markdown_path"])
+    else:
+        file_registry.set_status(pdf_path, "failed", message=result["message"])
+    return result
+
+def profile_conversion(pdf_path: str) -> dict:
+    """Convert a PDF (bypassing the cache) while profiling each workflow node.
+
+    The profile report (JSON) and the raw pstats data are stored next to the Markdown
+    and returned as profile_url and profile_data_url. The conversion starts once running
+    conversions have finished, and others wait until it is done.
+    """
+    request_profile = RequestProfile("convert_pdf", os.path.basename(pdf_path))
+    try:
+        with request_profile.capture():
+            result = convert_with_cache(pdf_path, use_cache=False)
+    except ProfilingBusy as e:
+        logger.warning(f"Converting {pdf_path} without profiling: {str(e)}")
+        with unprofiled_work():
+            result = convert_with_cache(pdf_path)
+        result["profile"] = {"status": "error", "message": str(e)}
+        return result
+    saved = request_profile.save(output_store)
+    result["profile_url"] = build_download_url(saved["report"]["path"])
+    if "data" in saved:
+        result["profile_data_url"] = build_download_url(saved["data"]["path"])
+    return result
+
+def convert_with_cache(pdf_path: str, use_cache: bool = True, file_hash: Optional[str] = None) -> dict:
+    """Convert a PDF (or reuse a cached conversion) and attach the download URL."""
+    cache_key = None
+    if use_cache and conversion_cache is not None and os.path.exists(pdf_path):
+        cache_key = make_cache_key(file_hash or hash_file(pdf_path), conversion_settings())
+        cached = conversion_cache.get(cache_key)
+        if cached:
+            markdown_path = cached["path"]
+            logger.info(f"Cache hit for {pdf_path} ({cache_key[:12]})")
+            return {
+                "status": "success",
+                "message": f"Successfully converted {pdf_path} to Markdown (cached)",
+                "markdown_path": markdown_path,
+                "download_url": build_download_url(markdown_path),
+                "cached": True,
+            }
+    
+    result = convert_pdf_to_markdown(pdf_path)
+    if result["status"] == "success":
+        result["download_url"] = build_download_url(result["markdown_path"])
+        if cache_key is not None:
+            conversion_cache.put(cache_key, result["markdown_path"])
+        result["cached"] = False
+    return result
+
 @mcp.tool()
-def convert_pdf_to_markdown_tool(pdf_path: str) -> dict:
-    """Convert a PDF file to Markdown format and save it to the specified output directory."""
+async def convert_pdf_to_markdown_tool(pdf_path: str, wait: bool = False, profile: bool = False,
+                                       admin_token: str = "") -> dict:
+    """Queue a PDF file for conversion to Markdown and return a job ID.
+
+    Poll conversion_job_status with the job ID to follow progress and get the result.
+    Set wait=True to wait for the conversion to finish and return its result directly.
+    Admins can set profile=True (with admin_token) to record a CPU and allocation profile
+    per workflow node; the result then includes profile_url.
+    """
     logger.info(f"convert_pdf_to_markdown_tool called with pdf_path: {pdf_path}")
     
     # Resolve relative pdf_path to UPLOAD_DIR (uploaded)
@@ -83,16 +344,87 @@ def convert_pdf_to_markdown_tool(pdf_path: str) -> dict:
         logger.error("No file provided in upload")
         return {"status": "error", "message": "No file provided"}
     
-    # Call convert_pdf_to_markdown from pdf2md.py
-    result = convert_pdf_to_markdown(pdf_abs_path)
-    if result["status"] == "success":
-        markdown_path = result["markdown_path"]
-        filename = os.path.basename(markdown_path)
-        host = os.getenv("PUBLIC_HOST", "localhost")  # Use "localhost" for external access
-        port = os.getenv("PORT", "8001")
-        public_url = f"http://{host}:{port}/output/{quote(filename)}"
-        result["download_url"] = public_url
-    return result
+    if profile and not profiling_allowed(admin_token):
+        logger.error("Profiling requested without a valid admin token")
+        return {"status": "error", "message": "Profiling requires a valid admin token"}
+    
+    try:
+        job_id = job_queue.submit(run_conversion, pdf_abs_path, profile)
+    except QueueFullError as e:
+        logger.error(str(e))
+        return {"status": "error", "message": str(e)}
+    
+    if wait:
+        result = await asyncio.wrap_future(job_queue.future(job_id))
+        return {**result, "job_id": job_id}
+    return {"status": "queued", "job_id": job_id, "pdf_path": pdf_abs_path}
+
+@mcp.tool()
+def conversion_job_status(job_id: str) -> dict:
+    """Get the status of a conversion job (queued, running, completed or failed) and its result when done."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return {"status": "error", "message": f"Unknown or expired job {job_id}"}
+    return job
+
+@mcp.tool()
+def conversion_queue_stats() -> dict:
+    """Report the conversion worker pool size and the number of jobs in each state."""
+    return job_queue.stats()
+
+@mcp.tool()
+def list_processed_files(offset: int = 0, limit: int = 50, status: Optional[str] = None) -> dict:
+    """List uploaded files (name, hash, size, status, timestamps) one page at a time.
+
+    Use next_offset from the response to fetch the following page. Optionally filter by
+    status: uploaded, converting, converted, failed or deleted.
+    """
+    return file_registry.list(offset=offset, limit=limit, status=status)
+
+@mcp.tool()
+def file_status(file_name: str) -> dict:
+    """Get the registry entry (path, hash, size, conversion status, timestamps) of an uploaded file.
+
+    Pass the path returned by the upload to get that exact upload; a bare file name
+    returns the most recently updated upload sent under that name.
+    """
+    entry = file_registry.get(file_name) if os.path.isabs(file_name) else file_registry.latest_by_name(file_name)
+    if entry is None:
+        return {"status": "error", "message": f"File {file_name} not found"}
+    return entry
+
+@mcp.tool()
+def conversion_cache_stats() -> dict:
+    """Report conversion cache entries, hit/miss counters and stale entries dropped."""
+    if conversion_cache is None:
+        return {"status": "error", "message": "Conversion cache is disabled"}
+    return conversion_cache.stats()
+
+@mcp.tool()
+def output_store_stats() -> dict:
+    """Report stored Markdown artifacts, bytes used against the disk budget, dedupes and GC evictions."""
+    return output_store.stats()
+
+def create_app():
+    """Build the server state and the ASGI app: the MCP endpoint, upload routes, /metrics and /output."""
+    global job_queue, conversion_cache, file_registry
+    job_queue = JobQueue()
+    conversion_cache = ConversionCache(output_store) if CACHE_ENABLED else None
+    file_registry = FileRegistry()
+
+    app = mcp.streamable_http_app()
+    if app is None:
+        raise AttributeError("streamable_http_app() returned None")
+    # Prometheus metrics; the store and queue figures are read at scrape time
+    register_stats(output_store, job_queue)
+    app.add_route("/metrics", metrics_endpoint, methods=["GET"])
+    # Use @mcp.tool() will cost tokens of llm model and inefficient. API for upload pdf file is more efficient.
+    app.add_route("/mcp/upload_pdf_tool", upload_pdf_tool, methods=["POST"])
+    app.add_route("/mcp/upload_convert_tool", upload_convert_tool, methods=["POST"])
+    app.add_route("/mcp/batch_convert_tool", batch_convert_tool, methods=["POST"])
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    app.mount("/output", OutputFiles(output_store), name="output")
+    return app
 
 def main():
     """Run the MCP PDF to Markdown conversion server."""
@@ -111,10 +443,7 @@ def main():
     if host == "0.0.0.0" or os.getenv("RAILWAY_ENVIRONMENT"):
         logger.info("🚀 PRODUCTION MODE: Using FastMCP's streamable_http_app directly")
         try:
-            if app is None:
-                raise AttributeError("streamable_http_app() returned None")
-            os.makedirs(OUTPUT_DIR, exist_ok=True)
-            app.mount("/output", StaticFiles(directory=OUTPUT_DIR), name="output")
+            app = create_app()
             logger.info(f"✅ SUCCESS: Got streamable_http_app from FastMCP!")
             logger.info(f"Running Uvicorn on {host}:{port}")
             uvicorn.run(app, host=host, port=port, log_level="info", access_log=True)
@@ -123,6 +452,7 @@ def main():
             mcp.run(transport="streamable-http")
     else:
         logger.info("🏠 LOCAL DEVELOPMENT: Using FastMCP default")
+        create_app()
         mcp.run(transport="streamable-http")
 
 if __name__ == "__main__":
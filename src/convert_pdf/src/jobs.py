@@ -0,0 +1,107 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Number of conversions that may run at the same time
+CONVERT_CONCURRENCY = int(os.getenv("CONVERT_CONCURRENCY", "2"))
+# Maximum number of jobs waiting or running before new submissions are rejected
+MAX_PENDING_JOBS = int(os.getenv("MAX_PENDING_JOBS", "100"))
+# Seconds a finished job is kept around for status polling
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "3600"))
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the job queue has reached MAX_PENDING_JOBS."""
+
+
+class JobQueue:
+    """Bounded worker pool that runs jobs in the background and tracks their status."""
+
+    def __init__(self, max_workers: int = CONVERT_CONCURRENCY, max_pending: int = MAX_PENDING_JOBS,
+                 ttl_seconds: int = JOB_TTL_SECONDS):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="convert")
+        self._jobs: Dict[str, dict] = {}
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[..., dict], *args, **kwargs) -> str:
+        """Queue fn(*args, **kwargs) and return its job ID immediately."""
+        with self._lock:
+            self._expire_locked()
+            active = sum(1 for job in self._jobs.values() if job["status"] in ("queued", "running"))
+            if active >= self.max_pending:
+                raise QueueFullError(f"Conversion queue is full ({self.max_pending} jobs pending)")
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "status": "queued",
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "result": None,
+            }
+            self._futures[job_id] = self._executor.submit(self._run, job_id, fn, *args, **kwargs)
+        logger.info(f"Job {job_id} queued")
+        return job_id
+
+    def _run(self, job_id: str, fn: Callable[..., dict], *args, **kwargs) -> dict:
+        self._update(job_id, status="running", started_at=time.time())
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            logger.exception(f"Job {job_id} failed: {str(e)}")
+            result = {"status": "error", "message": str(e)}
+        status = "failed" if result.get("status") == "error" else "completed"
+        self._update(job_id, status=status, finished_at=time.time(), result=result)
+        logger.info(f"Job {job_id} {status}")
+        return result
+
+    def _update(self, job_id: str, **fields) -> None:
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def _expire_locked(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job["finished_at"] is not None and job["finished_at"] < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+            self._futures.pop(job_id, None)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Return a snapshot of the job, or None if it is unknown or expired."""
+        with self._lock:
+            self._expire_locked()
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = dict(job)
+            queued = [j for j in self._jobs.values() if j["status"] == "queued"]
+        if snapshot["status"] == "queued":
+            snapshot["queue_position"] = sum(1 for j in queued if j["submitted_at"] <= snapshot["submitted_at"])
+        return snapshot
+
+    def future(self, job_id: str) -> Optional[Future]:
+        """Return the future backing a job, so callers can await its completion."""
+        with self._lock:
+            return self._futures.get(job_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {"max_workers": self.max_workers, "max_pending": self.max_pending, "jobs": counts}
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
@@ -0,0 +1,74 @@
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+from starlette.requests import Request
+from starlette.responses import Response
+
+# Conversions range from milliseconds (cache hits) to many minutes (long scanned documents)
+SECONDS_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+NODE_SECONDS = Histogram(
+    "convert_pdf_node_seconds", "Time spent in each conversion workflow node", ["node"], buckets=SECONDS_BUCKETS
+)
+CONVERSION_SECONDS = Histogram(
+    "convert_pdf_conversion_seconds", "End-to-end conversion time by result (success, cached, error)", ["result"],
+    buckets=SECONDS_BUCKETS,
+)
+CONVERSIONS_IN_FLIGHT = Gauge("convert_pdf_conversions_in_flight", "Conversions currently running")
+PAGES = Counter("convert_pdf_pages", "PDF pages extracted")
+PAGES_OCR = Counter("convert_pdf_pages_ocr", "PDF pages sent to OCR")
+UPLOAD_BYTES = Counter("convert_pdf_upload_bytes", "Bytes of PDF uploads received")
+ERRORS = Counter("convert_pdf_errors", "Failures by stage (workflow node, upload, batch_upload)", ["stage"])
+
+
+def instrument_node(name: str, node):
+    """Wrap a workflow node so its run time and failures are recorded.
+
+    Nodes skipped because an earlier node failed are not timed.
+    """
+    def run(state):
+        if state["error"]:
+            return node(state)
+        start = time.perf_counter()
+        update = node(state)
+        NODE_SECONDS.labels(name).observe(time.perf_counter() - start)
+        if update.get("error"):
+            ERRORS.labels(name).inc()
+        return update
+    return run
+
+
+class StatsCollector(Collector):
+    """Expose the output store and job queue counters, read when /metrics is scraped."""
+
+    def __init__(self, output_store, job_queue):
+        self.output_store = output_store
+        self.job_queue = job_queue
+
+    def collect(self):
+        stats = self.output_store.stats()
+        yield GaugeMetricFamily("convert_pdf_output_artifacts", "Artifacts in the output store", value=stats["artifacts"])
+        yield GaugeMetricFamily("convert_pdf_output_disk_bytes", "Bytes on disk used by the output store",
+                                value=stats["disk_bytes"])
+        yield CounterMetricFamily("convert_pdf_output_written_bytes", "Bytes written to the output store",
+                                  value=stats["bytes_written"])
+        yield CounterMetricFamily("convert_pdf_output_deduped", "Stored outputs that matched an existing artifact",
+                                  value=stats["deduped"])
+        yield CounterMetricFamily("convert_pdf_output_evictions", "Artifacts deleted by the output store GC",
+                                  value=stats["evictions"])
+        jobs = GaugeMetricFamily("convert_pdf_jobs", "Conversion jobs by status", labels=["status"])
+        counts = self.job_queue.stats()["jobs"]
+        for status in ("queued", "running", "completed", "failed"):
+            jobs.add_metric([status], counts.get(status, 0))
+        yield jobs
+
+
+def register_stats(output_store, job_queue) -> None:
+    REGISTRY.register(StatsCollector(output_store, job_queue))
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    """Prometheus text exposition of every metric in the default registry."""
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
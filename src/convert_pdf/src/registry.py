@@ -0,0 +1,142 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from .pdf2md import PROJECT_ROOT, UPLOAD_DIR
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_DB = os.getenv("REGISTRY_DB") or (
+    "/app/db/processed_files.db" if os.getenv("DOCKER_ENV") else os.path.join(PROJECT_ROOT, "processed_files.db")
+)
+# Legacy JSON list imported into the registry the first time it is created
+LEGACY_PROCESSED_LIST = "/app/processed_files.json" if os.getenv("DOCKER_ENV") else os.path.join(PROJECT_ROOT, "processed_files.json")
+MAX_PAGE_SIZE = 500
+
+_COLUMNS = ("path", "name", "sha256", "size", "status", "markdown_path", "message", "created_at", "updated_at")
+
+
+class FileRegistry:
+    """SQLite (WAL) registry of uploaded files, keyed by stored path and indexed by name and content hash.
+
+    Every upload is stored under its own path, so files sent under the same name (a
+    re-upload, or the same name in several batches) each keep their own entry.
+    """
+
+    def __init__(self, db_path: str = REGISTRY_DB, legacy_path: Optional[str] = LEGACY_PROCESSED_LIST):
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._db.row_factory = sqlite3.Row
+        # WAL lets readers run alongside a writer, also across server processes
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY,"
+            " name TEXT NOT NULL,"
+            " sha256 TEXT,"
+            " size INTEGER,"
+            " status TEXT NOT NULL,"
+            " markdown_path TEXT,"
+            " message TEXT,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS files_sha256 ON files (sha256)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS files_name ON files (name, updated_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS files_status ON files (status, name)")
+        self._db.commit()
+        if legacy_path:
+            self._import_legacy(legacy_path)
+
+    def _import_legacy(self, legacy_path: str) -> None:
+        if not os.path.exists(legacy_path):
+            return
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM files LIMIT 1").fetchone():
+                return
+            try:
+                with open(legacy_path) as f:
+                    names = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not import {legacy_path}: {str(e)}")
+                return
+            now = time.time()
+            self._db.executemany(
+                "INSERT OR IGNORE INTO files (path, name, status, created_at, updated_at)"
+                " VALUES (?, ?, 'uploaded', ?, ?)",
+                [(os.path.join(UPLOAD_DIR, name), name, now, now) for name in names if isinstance(name, str)],
+            )
+            self._db.commit()
+        logger.info(f"Imported {len(names)} entries from {legacy_path}")
+
+    def record_upload(self, path: str, sha256: str, size: int) -> None:
+        """Insert or refresh the entry for a file uploaded to path."""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO files (path, name, sha256, size, status, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, 'uploaded', ?, ?)"
+                " ON CONFLICT(path) DO UPDATE SET sha256 = excluded.sha256, size = excluded.size,"
+                " status = 'uploaded', markdown_path = NULL, message = NULL, updated_at = excluded.updated_at",
+                (os.path.abspath(path), os.path.basename(path), sha256, size, now, now),
+            )
+            self._db.commit()
+
+    def set_status(self, path: str, status: str, markdown_path: Optional[str] = None,
+                   message: Optional[str] = None) -> bool:
+        """Update the status of the file uploaded to path; returns False if the file is unknown."""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE files SET status = ?, markdown_path = COALESCE(?, markdown_path), message = ?, updated_at = ?"
+                " WHERE path = ?",
+                (status, markdown_path, message, time.time(), os.path.abspath(path)),
+            )
+            self._db.commit()
+            return cursor.rowcount > 0
+
+    def get(self, path: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM files WHERE path = ?", (os.path.abspath(path),)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def latest_by_name(self, name: str) -> Optional[dict]:
+        """Return the most recently updated entry of the files uploaded under name."""
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM files WHERE name = ? ORDER BY updated_at DESC LIMIT 1", (name,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def find_by_hash(self, sha256: str) -> list:
+        with self._lock:
+            rows = self._db.execute(f"SELECT {', '.join(_COLUMNS)} FROM files WHERE sha256 = ?", (sha256,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def list(self, offset: int = 0, limit: int = 50, status: Optional[str] = None) -> dict:
+        """Return one page of entries ordered by name, plus the total count."""
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        offset = max(0, offset)
+        where, params = ("WHERE status = ?", [status]) if status else ("", [])
+        with self._lock:
+            total = self._db.execute(f"SELECT COUNT(*) FROM files {where}", params).fetchone()[0]
+            rows = self._db.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM files {where} ORDER BY name, path LIMIT ? OFFSET ?",
+                params + [limit, offset],
+            ).fetchall()
+        return {
+            "files": [dict(row) for row in rows],
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "next_offset": offset + limit if offset + limit < total else None,
+        }
@@ -0,0 +1,204 @@
+import re
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Union
+
+import numpy as np
+import pdfplumber
+
+# Lines set at least this much larger than the body text are headings
+HEADING_SIZE_RATIO = 1.15
+# Distinct heading font sizes mapped to #, ##, ###; smaller ones share the last level
+MAX_HEADING_LEVELS = 3
+# Longer lines are never headings, whatever their font
+MAX_HEADING_CHARS = 120
+# A vertical gap larger than this fraction of the font size starts a new paragraph
+PARAGRAPH_GAP_RATIO = 0.6
+
+BOLD_FONT = re.compile(r"bold|black|heavy|semibold|demi", re.IGNORECASE)
+BULLET_ITEM = re.compile(r"^(?:[-*–]\s+|[•●▪◦‣]\s*)(.+)$")
+NUMBERED_ITEM = re.compile(r"^(\d{1,3})[.)]\s+(.+)$")
+SENTENCE_END = re.compile(r"[.,;:!?]$")
+
+
+class TextLine(NamedTuple):
+    """One line of prose with the font data needed to classify it."""
+    text: str
+    size: float  # mean font size of the line's visible characters
+    bold: bool  # most of the line's characters use a bold font
+    x0: float
+    top: float
+    bottom: float
+    page: int
+
+
+class TableBlock(NamedTuple):
+    """A table already rendered as Markdown."""
+    markdown: str
+    page: int
+
+
+Block = Union[TextLine, TableBlock]
+
+
+def lines_from_chars(chars: list, page_number: int) -> List[TextLine]:
+    """Group characters into text lines and summarise each line's font size and weight."""
+    if not chars:
+        return []
+    lines = []
+    for line in pdfplumber.utils.chars_to_textmap(chars).extract_text_lines(strip=True, return_chars=True):
+        glyphs = [char for char in line["chars"] if not char["text"].isspace()]
+        if not glyphs:
+            continue
+        size = sum(char["size"] for char in glyphs) / len(glyphs)
+        bold = sum(1 for char in glyphs if BOLD_FONT.search(char.get("fontname", ""))) * 2 > len(glyphs)
+        lines.append(TextLine(line["text"], size, bold, line["x0"], line["top"], line["bottom"], page_number))
+    return lines
+
+
+def _line_arrays(lines: List[TextLine]) -> tuple:
+    count = len(lines)
+    # Half-point buckets absorb rounding noise in the reported sizes
+    sizes = np.round(np.fromiter((line.size for line in lines), dtype=np.float64, count=count) * 2) / 2
+    lengths = np.fromiter((len(line.text) for line in lines), dtype=np.int64, count=count)
+    return sizes, lengths
+
+
+def size_histogram(lines: List[TextLine]) -> Dict[float, int]:
+    """Characters set in each half-point font size bucket.
+
+    Histograms of separate pages can be summed, so the statistics of a document can be
+    gathered page by page without keeping its lines.
+    """
+    if not lines:
+        return {}
+    sizes, lengths = _line_arrays(lines)
+    values, inverse = np.unique(sizes, return_inverse=True)
+    return dict(zip(values.tolist(), np.bincount(inverse, weights=lengths).astype(np.int64).tolist()))
+
+
+def heading_scale(histogram: Dict[float, int]) -> tuple:
+    """(body size, heading sizes largest first) from a document's size histogram.
+
+    The body size is the font size carrying the most characters; sizes at least
+    HEADING_SIZE_RATIO larger are headings.
+    """
+    if not histogram:
+        return 0.0, np.zeros(0)
+    values = np.array(sorted(histogram))
+    weights = np.array([histogram[value] for value in values])
+    body_size = values[np.argmax(weights)]
+    return body_size, values[values >= body_size * HEADING_SIZE_RATIO][::-1]
+
+
+def heading_levels(lines: List[TextLine], scale: Optional[tuple] = None) -> np.ndarray:
+    """Heading level (0 = not a heading) of every line, from document-wide font statistics.
+
+    Heading sizes map to levels in descending order, and short bold lines at body size
+    become the next level down. scale comes from heading_scale() and defaults to the
+    statistics of lines themselves.
+    """
+    count = len(lines)
+    if count == 0:
+        return np.zeros(0, dtype=np.int8)
+    sizes, lengths = _line_arrays(lines)
+    bold = np.fromiter((line.bold for line in lines), dtype=bool, count=count)
+    terminal = np.fromiter((SENTENCE_END.search(line.text) is not None for line in lines), dtype=bool, count=count)
+    body_size, heading_sizes = scale if scale is not None else heading_scale(size_histogram(lines))
+
+    levels = np.zeros(count, dtype=np.int8)
+    if len(heading_sizes):
+        # One sorted lookup maps every line's size to its rank among the heading sizes
+        ascending = heading_sizes[::-1]
+        position = np.searchsorted(ascending, sizes)
+        found = ascending[np.minimum(position, len(ascending) - 1)] == sizes
+        rank = len(ascending) - position
+        levels[found] = np.minimum(rank[found], MAX_HEADING_LEVELS)
+    bold_level = min(len(heading_sizes[:MAX_HEADING_LEVELS]) + 1, MAX_HEADING_LEVELS + 1)
+    levels[(levels == 0) & bold & (sizes >= body_size) & ~terminal] = bold_level
+    levels[lengths > MAX_HEADING_CHARS] = 0
+    return levels
+
+
+def _join_lines(lines: List[str]) -> str:
+    text = lines[0]
+    for line in lines[1:]:
+        # Re-join words hyphenated across a line break
+        if text.endswith("-") and line[:1].islower():
+            text = text[:-1] + line
+        else:
+            text += " " + line
+    return text
+
+
+def blocks_to_markdown(blocks: List[Block], scale: Optional[tuple] = None) -> str:
+    """Render extracted blocks as Markdown headings, list items, paragraphs and tables."""
+    lines = [block for block in blocks if isinstance(block, TextLine)]
+    levels = heading_levels(lines, scale)
+    output = []
+    paragraph = []
+    list_item = None  # (text parts, x0) of the open list item
+    previous = None
+    line_index = 0
+
+    def flush():
+        nonlocal list_item
+        if paragraph:
+            output.append(_join_lines(paragraph))
+            paragraph.clear()
+        if list_item:
+            output.append(_join_lines(list_item[0]))
+            list_item = None
+
+    for block in blocks:
+        if isinstance(block, TableBlock):
+            flush()
+            output.append(block.markdown)
+            previous = None
+            continue
+
+        level = levels[line_index]
+        line_index += 1
+        text = " ".join(block.text.split())
+        new_block = (
+            previous is None
+            or block.page != previous.page
+            or block.top - previous.bottom > block.size * PARAGRAPH_GAP_RATIO
+        )
+        if level:
+            flush()
+            output.append("#" * int(level) + " " + text)
+        elif (match := BULLET_ITEM.match(text)) is not None:
+            flush()
+            list_item = (["- " + match.group(1)], block.x0)
+        elif (match := NUMBERED_ITEM.match(text)) is not None:
+            flush()
+            list_item = ([f"{match.group(1)}. {match.group(2)}"], block.x0)
+        elif list_item and not new_block and block.x0 > list_item[1]:
+            # Indented continuation of the open list item
+            list_item[0].append(text)
+        else:
+            if new_block or list_item:
+                flush()
+            paragraph.append(text)
+        previous = block
+    flush()
+    return "\n\n".join(output)
+
+
+def iter_markdown(pages: Iterable[List[Block]], scale: tuple) -> Iterator[str]:
+    """Render a document page by page with precomputed font statistics.
+
+    Paragraphs and list items never continue across pages, so the chunks joined
+    together are identical to blocks_to_markdown() of the whole document.
+    """
+    first = True
+    for blocks in pages:
+        markdown = blocks_to_markdown(blocks, scale)
+        if not markdown:
+            continue
+        yield markdown if first else "\n\n" + markdown
+        first = False
+
+
+def blocks_to_text(blocks: List[Block]) -> str:
+    """Plain text of the blocks, one line per text line (used for checks and benchmarks)."""
+    return "\n".join(block.text if isinstance(block, TextLine) else block.markdown for block in blocks)
@@ -0,0 +1,359 @@
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import zipfile
+from typing import Dict, Optional
+
+from starlette.requests import Request
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+logger = logging.getLogger(__name__)
+
+# Largest accepted upload; bigger files are rejected while streaming
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(512 * 1024 * 1024)))
+# A PDF must start with this signature within its first PDF_HEADER_WINDOW bytes
+PDF_MAGIC = b"%PDF-"
+PDF_HEADER_WINDOW = 1024
+ZIP_MAGIC = b"PK\x03\x04"
+# Limits for batch uploads (many files or one zip archive per request)
+MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", "1000"))
+MAX_BATCH_BYTES = int(os.getenv("MAX_BATCH_BYTES", str(4 * 1024 * 1024 * 1024)))
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadRejected(Exception):
+    """Raised when an upload is invalid; carries the HTTP status to answer with."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class UploadStreamWriter:
+    """Write an uploaded file to disk chunk by chunk, hashing and validating bytes as they arrive."""
+
+    def __init__(self, dest_dir: str, file_name: str, max_bytes: int = MAX_UPLOAD_BYTES,
+                 magic: bytes = PDF_MAGIC, kind: str = "PDF"):
+        self.dest_dir = dest_dir
+        self.file_name = file_name
+        self.max_bytes = max_bytes
+        self.magic = magic
+        self.kind = kind
+        self.size = 0
+        # Name the file was sent under, when it had to be stored under another one
+        self.source_name = None
+        self._digest = hashlib.sha256()
+        self._head = b""
+        self._checked = False
+        fd, self._tmp_path = tempfile.mkstemp(prefix=".upload_", suffix=".part", dir=dest_dir)
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, data: bytes) -> None:
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise UploadRejected(f"File exceeds the maximum upload size of {self.max_bytes} bytes", 413)
+        if not self._checked:
+            self._head += data[:PDF_HEADER_WINDOW]
+            if len(self._head) >= PDF_HEADER_WINDOW:
+                self._check_magic()
+        self._digest.update(data)
+        self._file.write(data)
+
+    def _check_magic(self) -> None:
+        self._checked = True
+        if self.magic not in self._head[:PDF_HEADER_WINDOW]:
+            raise UploadRejected(f"'{self.file_name}' is not a {self.kind} file")
+
+    @property
+    def sha256(self) -> str:
+        return self._digest.hexdigest()
+
+    def commit(self, keep_temp_name: bool = False, unique: bool = False) -> str:
+        """Finish the upload and atomically move it into place; returns the final path.
+
+        With unique, an existing file of the same name is kept and the upload gets the
+        first free name with a -2, -3... suffix instead (see _reserve_path).
+        """
+        if not self._checked:
+            self._check_magic()
+        self._file.close()
+        if keep_temp_name:
+            return self._tmp_path
+        if unique:
+            file_path = _reserve_path(self.dest_dir, self.file_name)
+            if os.path.basename(file_path) != self.file_name:
+                self.source_name = self.source_name or self.file_name
+                self.file_name = os.path.basename(file_path)
+        else:
+            file_path = os.path.join(self.dest_dir, self.file_name)
+        os.replace(self._tmp_path, file_path)
+        return file_path
+
+    def info(self, path: str) -> dict:
+        info = {"path": path, "filename": self.file_name, "size": self.size, "sha256": self.sha256}
+        if self.source_name:
+            info["source_name"] = self.source_name
+        return info
+
+    def abort(self) -> None:
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+def _validate_file_name(file_name: Optional[str], allow_zip: bool = False) -> str:
+    # Strip any client-supplied directories so uploads cannot escape UPLOAD_DIR
+    file_name = os.path.basename((file_name or "").replace("\\", "/"))
+    if not file_name:
+        raise UploadRejected("No file provided")
+    if allow_zip and file_name.lower().endswith(".zip"):
+        return file_name
+    if not file_name.lower().endswith(".pdf"):
+        raise UploadRejected("Only PDF files are allowed")
+    return file_name
+
+
+def _claim_file_name(file_name: str, taken: Optional[set]) -> str:
+    """Return file_name, or file_name with a -2, -3... suffix if it is already in taken, and add it to taken.
+
+    Files of one batch share a directory, so same-named files must not overwrite each other.
+    """
+    if taken is None:
+        return file_name
+    stem, ext = os.path.splitext(file_name)
+    candidate, n = file_name, 1
+    while candidate.lower() in taken:
+        n += 1
+        candidate = f"{stem}-{n}{ext}"
+    taken.add(candidate.lower())
+    return candidate
+
+
+def _reserve_path(dest_dir: str, file_name: str) -> str:
+    """Create dest_dir/file_name, or the first free name with a -2, -3... suffix, and return its path.
+
+    The file is created exclusively, so concurrent uploads of the same name never get the
+    same path; the caller then replaces the empty placeholder with the upload.
+    """
+    stem, ext = os.path.splitext(file_name)
+    candidate, n = file_name, 1
+    while True:
+        path = os.path.join(dest_dir, candidate)
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return path
+        except FileExistsError:
+            n += 1
+            candidate = f"{stem}-{n}{ext}"
+
+
+async def _stream_multipart(request: Request, dest_dir: str, max_bytes: int, max_files: int,
+                            max_total_bytes: int, allow_zip: bool, taken: Optional[set] = None) -> tuple:
+    """Parse a multipart body incrementally, writing every "file" part straight to dest_dir.
+
+    With max_files == 1 any invalid file aborts the request; otherwise invalid files are
+    reported per file (with an "error" key) and the rest of the batch is still accepted.
+    PDF names are made unique within taken when it is given, and otherwise against the
+    files already in dest_dir. Returns (files, fields).
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_total_bytes + 64 * 1024:
+        raise UploadRejected(f"Upload exceeds the maximum size of {max_total_bytes} bytes", 413)
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise UploadRejected("Expected a multipart/form-data upload")
+
+    strict = max_files == 1
+    files = []
+    fields: Dict[str, str] = {}
+    part = {"headers": {}, "field": b"", "value": b"", "name": None, "data": [], "writer": None}
+    state = {"received": 0}
+
+    def reject(error: UploadRejected, file_name: Optional[str]):
+        if part["writer"] is not None:
+            part["writer"].abort()
+            part["writer"] = None
+        if strict or error.status_code == 413 and state["received"] > max_total_bytes:
+            raise error
+        files.append({"filename": file_name, "error": error.message})
+        part["name"] = None  # discard the rest of this part
+
+    def on_part_begin():
+        part.update(headers={}, name=None, data=[], writer=None)
+
+    def on_header_field(data, start, end):
+        part["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        part["value"] += data[start:end]
+
+    def on_header_end():
+        part["headers"][part["field"].lower()] = part["value"]
+        part["field"], part["value"] = b"", b""
+
+    def on_headers_finished():
+        _, options = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        part["name"] = options.get(b"name", b"").decode("utf-8")
+        if part["name"] != "file":
+            return
+        raw_name = options.get(b"filename", b"").decode("utf-8")
+        try:
+            if len(files) >= max_files:
+                raise UploadRejected(f"At most {max_files} files may be uploaded per request")
+            file_name = _validate_file_name(raw_name, allow_zip)
+            if file_name.lower().endswith(".zip"):
+                part["writer"] = UploadStreamWriter(dest_dir, file_name, max_total_bytes, ZIP_MAGIC, "zip")
+            else:
+                stored_name = _claim_file_name(file_name, taken)
+                part["writer"] = UploadStreamWriter(dest_dir, stored_name, max_bytes)
+                if stored_name != file_name:
+                    part["writer"].source_name = raw_name
+        except UploadRejected as e:
+            reject(e, raw_name)
+
+    def on_part_data(data, start, end):
+        if part["name"] == "file":
+            state["received"] += end - start
+            try:
+                if state["received"] > max_total_bytes:
+                    raise UploadRejected(f"Upload exceeds the maximum size of {max_total_bytes} bytes", 413)
+                part["writer"].write(data[start:end])
+            except UploadRejected as e:
+                reject(e, part["writer"].file_name if part["writer"] else None)
+        elif part["name"]:
+            part["data"].append(data[start:end])
+
+    def on_part_end():
+        if part["name"] == "file":
+            writer = part["writer"]
+            try:
+                # Archives keep their temporary name until they are unpacked
+                path = writer.commit(keep_temp_name=writer.magic == ZIP_MAGIC, unique=taken is None)
+            except UploadRejected as e:
+                reject(e, writer.file_name)
+                return
+            files.append(dict(writer.info(path), kind=writer.kind))
+            part["writer"] = None
+        elif part["name"]:
+            fields[part["name"]] = b"".join(part["data"]).decode("utf-8")
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+    })
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+        parser.finalize()
+    except Exception:
+        if part["writer"] is not None:
+            part["writer"].abort()
+        for entry in files:
+            if entry.get("kind") == "zip":
+                os.remove(entry["path"])
+        raise
+    return files, fields
+
+
+async def receive_pdf_upload(request: Request, dest_dir: str, max_bytes: int = MAX_UPLOAD_BYTES) -> dict:
+    """Stream a multipart PDF upload (field "file") to dest_dir without buffering it in memory.
+
+    An existing file of the same name is never replaced: the upload is then stored as
+    name-2.pdf, name-3.pdf... and its result also carries source_name, the name as sent.
+    Returns the saved path, file name, size, SHA-256 and any other form fields.
+    Raises UploadRejected as soon as the upload is found to be invalid.
+    """
+    files, fields = await _stream_multipart(request, dest_dir, max_bytes, 1, max_bytes, allow_zip=False)
+    if not files:
+        raise UploadRejected("No file provided")
+    upload = files[0]
+    logger.info(f"Streamed '{upload['filename']}' ({upload['size']} bytes, sha256 {upload['sha256'][:12]}) to {upload['path']}")
+    del upload["kind"]
+    return dict(upload, fields=fields)
+
+
+def extract_pdfs_from_zip(zip_path: str, dest_dir: str, max_bytes: int = MAX_UPLOAD_BYTES,
+                          max_files: int = MAX_BATCH_FILES, taken: Optional[set] = None) -> list:
+    """Unpack the PDFs of a zip archive into dest_dir, streaming and validating each member.
+
+    Members are stored under their base name, made unique within taken (e.g. x/report.pdf
+    and y/report.pdf become report.pdf and report-2.pdf).
+    """
+    results = []
+    try:
+        with zipfile.ZipFile(zip_path) as archive:
+            members = [m for m in archive.infolist()
+                       if not m.is_dir() and m.filename.lower().endswith(".pdf")
+                       and not m.filename.startswith("__MACOSX/")]
+            if len(members) > max_files:
+                raise UploadRejected(f"Archive contains more than {max_files} PDF files")
+            for member in members:
+                file_name = _validate_file_name(member.filename)
+                if member.file_size > max_bytes:
+                    results.append({"filename": file_name, "error": f"File exceeds the maximum upload size of {max_bytes} bytes"})
+                    continue
+                writer = UploadStreamWriter(dest_dir, _claim_file_name(file_name, taken), max_bytes)
+                if writer.file_name != file_name:
+                    writer.source_name = member.filename
+                try:
+                    # Sizes in the zip header can lie, so the writer enforces max_bytes on the real data
+                    with archive.open(member) as src:
+                        for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                            writer.write(chunk)
+                    results.append(writer.info(writer.commit()))
+                except UploadRejected as e:
+                    writer.abort()
+                    results.append({"filename": file_name, "error": e.message})
+                except Exception:
+                    writer.abort()
+                    raise
+    except zipfile.BadZipFile as e:
+        raise UploadRejected(f"Invalid zip archive: {str(e)}")
+    return results
+
+
+async def receive_pdf_batch(request: Request, dest_dir: str, max_bytes: int = MAX_UPLOAD_BYTES,
+                            max_files: int = MAX_BATCH_FILES, max_total_bytes: int = MAX_BATCH_BYTES) -> dict:
+    """Stream a batch upload (repeated "file" fields and/or zip archives of PDFs) to dest_dir.
+
+    Returns {"files": [...], "fields": {...}}; each file entry has path, filename, size and
+    sha256, or filename and error if that file was rejected. Same-named files get unique
+    names (see _claim_file_name); their entries also carry source_name, the name as sent.
+    """
+    taken = set()
+    files, fields = await _stream_multipart(request, dest_dir, max_bytes, max_files, max_total_bytes,
+                                            allow_zip=True, taken=taken)
+    uploads = []
+    for entry in files:
+        if entry.get("kind") == "zip":
+            try:
+                uploads.extend(await asyncio.to_thread(extract_pdfs_from_zip, entry["path"], dest_dir, max_bytes, max_files,
+                                                       taken))
+            except UploadRejected as e:
+                uploads.append({"filename": entry["filename"], "error": e.message})
+            finally:
+                os.remove(entry["path"])
+        else:
+            entry.pop("kind", None)
+            uploads.append(entry)
+    if len(uploads) > max_files:
+        raise UploadRejected(f"At most {max_files} files may be uploaded per request")
+    if not uploads:
+        raise UploadRejected("No file provided")
+    logger.info(f"Streamed batch of {len(uploads)} files to {dest_dir}")
+    return {"files": uploads, "fields": fields}
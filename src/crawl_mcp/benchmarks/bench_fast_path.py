@@ -0,0 +1,124 @@
+"""Compare the HTTP fast path with browser rendering on the local fixture site.
+
+Reports latency and peak memory (this process plus any browser processes it starts) for
+server-rendered pages, and checks that client-rendered pages fall back to the browser.
+
+Usage (from src/crawl_mcp):
+    python benchmarks/bench_fast_path.py --requests 20
+    python benchmarks/bench_fast_path.py --requests 20 --skip-browser
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+
+import httpx
+import psutil
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from crawler_pool import CrawlerPool  # noqa: E402
+from fast_path import FastPath  # noqa: E402
+from fixture_site import serve_fixture_site  # noqa: E402
+
+
+class PeakMemory:
+    """Sample the RSS of this process and its children in the background and keep the peak."""
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _rss(self) -> int:
+        process = psutil.Process()
+        total = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.NoSuchProcess:
+                pass
+        return total
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._rss())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._rss())
+
+
+def summarize(label: str, timings: list, peak_bytes: int) -> None:
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"{label:<12} mean {statistics.mean(timings) * 1000:8.1f} ms   "
+          f"p50 {statistics.median(timings) * 1000:8.1f} ms   p95 {p95 * 1000:8.1f} ms   "
+          f"peak RSS {peak_bytes / 1024 / 1024:7.1f} MB")
+
+
+async def fast(urls: list) -> tuple:
+    async with httpx.AsyncClient(follow_redirects=True, timeout=30) as client:
+        path = FastPath(client)
+        timings = []
+        for url in urls:
+            start = time.perf_counter()
+            result = await path.fetch(url)
+            timings.append(time.perf_counter() - start)
+            if result is None:
+                raise RuntimeError(f"{url} unexpectedly fell back to the browser")
+        return timings, path
+
+
+async def browser(urls: list) -> list:
+    pool = CrawlerPool(size=1)
+    await pool.start()
+    try:
+        timings = []
+        for url in urls:
+            start = time.perf_counter()
+            await pool.arun(url)
+            timings.append(time.perf_counter() - start)
+        return timings
+    finally:
+        await pool.stop()
+
+
+async def run(requests: int, skip_browser: bool) -> None:
+    with serve_fixture_site() as base_url:
+        urls = [f"{base_url}/page/{i}" for i in range(requests)]
+        with PeakMemory() as memory:
+            timings, path = await fast(urls)
+        summarize("fast path", timings, memory.peak)
+
+        async with httpx.AsyncClient(timeout=30) as client:
+            spa = FastPath(client)
+            fell_back = [await spa.fetch(f"{base_url}/spa/{i}") is None for i in range(5)]
+        print(f"SPA pages sent to the browser: {sum(fell_back)}/{len(fell_back)} {spa.stats()['fallback_reasons']}")
+
+        if not skip_browser:
+            with PeakMemory() as memory:
+                timings = await browser(urls)
+            summarize("browser", timings, memory.peak)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the HTTP fast path against browser rendering")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--skip-browser", action="store_true", help="Only measure the fast path")
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.skip_browser))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Compare crawl latency of a cold browser launch per call with the warm crawler pool.
+
+Usage (from src/crawl_mcp):
+    python benchmarks/bench_pool.py --requests 20 --pool-size 2
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from crawl4ai import AsyncWebCrawler  # noqa: E402
+
+from crawler_pool import CrawlerPool  # noqa: E402
+from fixture_site import serve_fixture_site  # noqa: E402
+
+
+def summarize(label: str, timings: list) -> None:
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"{label:<12} mean {statistics.mean(timings) * 1000:8.1f} ms   "
+          f"p50 {statistics.median(timings) * 1000:8.1f} ms   p95 {p95 * 1000:8.1f} ms")
+
+
+async def cold(urls: list) -> list:
+    timings = []
+    for url in urls:
+        start = time.perf_counter()
+        async with AsyncWebCrawler() as crawler:
+            await crawler.arun(url=url)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def warm(urls: list, pool_size: int) -> list:
+    pool = CrawlerPool(size=pool_size)
+    await pool.start()
+    try:
+        timings = []
+        for url in urls:
+            start = time.perf_counter()
+            await pool.arun(url)
+            timings.append(time.perf_counter() - start)
+        return timings
+    finally:
+        await pool.stop()
+
+
+async def run(requests: int, pool_size: int) -> None:
+    with serve_fixture_site() as base_url:
+        urls = [f"{base_url}/page/{i}" for i in range(requests)]
+        summarize("cold launch", await cold(urls))
+        summarize("warm pool", await warm(urls, pool_size))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold browser launch vs warm crawler pool")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--pool-size", type=int, default=2)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.pool_size))
+
+
+if __name__ == "__main__":
+    main()
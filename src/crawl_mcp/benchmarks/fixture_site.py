@@ -0,0 +1,78 @@
+"""Local stand-in website used by the crawl benchmarks."""
+import hashlib
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PARAGRAPH = (
+    "<p>Server-rendered documentation paragraph with enough text to look like a real "
+    "article, including <a href=\"/page/{next}\">a link to the next page</a>.</p>"
+)
+
+
+def render_page(index: int, paragraphs: int = 40) -> str:
+    body = "".join(PARAGRAPH.format(next=index + 1) for _ in range(paragraphs))
+    return (
+        f"<!doctype html><html><head><title>Page {index}</title></head>"
+        f"<body><h1>Page {index}</h1>{body}</body></html>"
+    )
+
+
+SPA_PAGE = (
+    "<!doctype html><html><head><title>App</title></head>"
+    "<body><div id=\"root\"></div><script>document.getElementById('root').innerHTML = "
+    "'<h1>Client-rendered page</h1>';</script></body></html>"
+)
+
+
+LAST_MODIFIED = "Mon, 01 Jan 2024 00:00:00 GMT"
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Serves /page/<n> with ETag and Last-Modified, answering conditional requests with 304.
+
+    /spa/<n> serves a client-rendered page whose content only appears after JavaScript runs.
+    """
+
+    def do_GET(self):
+        if self.path.startswith("/spa/"):
+            payload = SPA_PAGE.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        elif self.path == "/" or self.path.startswith("/page/"):
+            index = int(self.path.rsplit("/", 1)[-1] or 0) if self.path != "/" else 0
+            payload = render_page(index).encode("utf-8")
+            etag = '"' + hashlib.sha256(payload).hexdigest()[:16] + '"'
+            if self.headers.get("If-None-Match") == etag or self.headers.get("If-Modified-Since") == LAST_MODIFIED:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", LAST_MODIFIED)
+            self.end_headers()
+            self.wfile.write(payload)
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def serve_fixture_site():
+    """Serve the fixture site on a free localhost port and yield its base URL."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
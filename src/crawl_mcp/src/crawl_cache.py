@@ -0,0 +1,171 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+from typing import Optional
+
+from urls import normalize_url
+
+logger = logging.getLogger(__name__)
+
+CRAWL_CACHE_DIR = os.getenv("CRAWL_CACHE_DIR", "cache")
+# Seconds a cached page is served without asking the origin server
+CRAWL_CACHE_TTL = int(os.getenv("CRAWL_CACHE_TTL", "3600"))
+# Total size of cached Markdown before least-recently-used pages are evicted
+CRAWL_CACHE_MAX_BYTES = int(os.getenv("CRAWL_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+CRAWL_CACHE_ENABLED = os.getenv("CRAWL_CACHE_ENABLED", "true").lower() == "true"
+
+_COLUMNS = ("key", "url", "etag", "last_modified", "content_hash", "size", "fetched_at", "last_access")
+
+
+def url_key(url: str) -> str:
+    return hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+
+
+def hash_body(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+def hash_html(html: str) -> str:
+    """Content hash of a page's decoded HTML, as stored on a miss and compared on revalidation."""
+    return hash_body(html.encode("utf-8"))
+
+
+class CrawlCache:
+    """On-disk cache of crawled Markdown keyed by normalized URL, with HTTP validators."""
+
+    def __init__(self, cache_dir: str = CRAWL_CACHE_DIR, ttl: int = CRAWL_CACHE_TTL,
+                 max_bytes: int = CRAWL_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.counters = {"fresh": 0, "revalidated": 0, "miss": 0, "evicted": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(cache_dir, "index.db"))
+        self._db.row_factory = sqlite3.Row
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " key TEXT PRIMARY KEY,"
+            " url TEXT NOT NULL,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " content_hash TEXT,"
+            " size INTEGER NOT NULL,"
+            " fetched_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS pages_last_access ON pages (last_access)")
+        self._db.commit()
+
+    def _markdown_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.md")
+
+    def get(self, url: str) -> Optional[dict]:
+        """Return the cache entry for url (with "fresh" and "markdown"), or None."""
+        key = url_key(url)
+        row = self._db.execute(f"SELECT {', '.join(_COLUMNS)} FROM pages WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        try:
+            with open(self._markdown_path(key), encoding="utf-8") as f:
+                markdown = f.read()
+        except FileNotFoundError:
+            self._db.execute("DELETE FROM pages WHERE key = ?", (key,))
+            self._db.commit()
+            return None
+        now = time.time()
+        self._db.execute("UPDATE pages SET last_access = ? WHERE key = ?", (now, key))
+        self._db.commit()
+        entry = dict(row)
+        entry["markdown"] = markdown
+        entry["fresh"] = now - entry["fetched_at"] < self.ttl
+        return entry
+
+    def put(self, url: str, markdown: str, etag: Optional[str] = None, last_modified: Optional[str] = None,
+            content_hash: Optional[str] = None) -> None:
+        key = url_key(url)
+        path = self._markdown_path(key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(markdown)
+        os.replace(tmp_path, path)
+        now = time.time()
+        self._db.execute(
+            "INSERT OR REPLACE INTO pages (key, url, etag, last_modified, content_hash, size, fetched_at, last_access)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, normalize_url(url), etag, last_modified, content_hash, os.path.getsize(path), now, now),
+        )
+        self._db.commit()
+        self._evict()
+
+    def touch(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None,
+              content_hash: Optional[str] = None) -> None:
+        """Mark an entry as freshly validated, refreshing any validators the server sent."""
+        self._db.execute(
+            "UPDATE pages SET fetched_at = ?, etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified),"
+            " content_hash = COALESCE(?, content_hash) WHERE key = ?",
+            (time.time(), etag, last_modified, content_hash, url_key(url)),
+        )
+        self._db.commit()
+
+    def _evict(self) -> None:
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for row in self._db.execute("SELECT key, size FROM pages ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._markdown_path(row["key"]))
+            except FileNotFoundError:
+                pass
+            self._db.execute("DELETE FROM pages WHERE key = ?", (row["key"],))
+            total -= row["size"]
+            self.counters["evicted"] += 1
+        self._db.commit()
+
+    def stats(self) -> dict:
+        entries, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+        return {"entries": entries, "bytes": total, "max_bytes": self.max_bytes, "ttl": self.ttl, **self.counters}
+
+
+async def revalidate(client, entry: dict, max_bytes: int) -> tuple:
+    """Ask the origin server whether a cached page changed, using a conditional GET.
+
+    Returns (unchanged, validators, page). A 304, or a 200 whose body hash matches the
+    stored content hash, counts as unchanged. validators holds the etag, last_modified and
+    content_hash to store for the page. A 200 body is read up to max_bytes; a larger one
+    is not hashed and counts as changed. When the page changed, page holds the body that
+    was read ({"url", "html", "headers"}) so it can be converted without fetching it again;
+    it is None otherwise.
+    """
+    headers = {}
+    if entry["etag"]:
+        headers["If-None-Match"] = entry["etag"]
+    if entry["last_modified"]:
+        headers["If-Modified-Since"] = entry["last_modified"]
+    async with client.stream("GET", entry["url"], headers=headers) as response:
+        validators = {
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+            "content_hash": None,
+        }
+        if response.status_code == 304:
+            return True, validators, None
+        response.raise_for_status()
+        length = response.headers.get("content-length")
+        if length and length.isdigit() and int(length) > max_bytes:
+            return False, validators, None
+        body = bytearray()
+        async for chunk in response.aiter_bytes():
+            body.extend(chunk)
+            if len(body) > max_bytes:
+                return False, validators, None
+        # Decoded as response.text would be, so the hash matches the one stored on a miss
+        html = bytes(body).decode(response.encoding or "utf-8", errors="replace")
+        page = {"url": str(response.url), "html": html, "headers": dict(response.headers)}
+    validators["content_hash"] = hash_html(html)
+    if validators["content_hash"] == entry["content_hash"]:
+        return True, validators, None
+    return False, validators, page
@@ -1,50 +1,400 @@
 import os
+import asyncio
+import json
 import logging
+import time
+from contextlib import asynccontextmanager, nullcontext
 from datetime import datetime
 from urllib.parse import quote
 from mcp.server.fastmcp import FastMCP
-from crawl4ai import AsyncWebCrawler
-from starlette.staticfiles import StaticFiles
 import uvicorn
+from typing import List, Optional
+import httpx
+from crawl_cache import CRAWL_CACHE_DIR, CRAWL_CACHE_ENABLED, CrawlCache, hash_html, revalidate
+from crawler_pool import CrawlerPool
+from fast_path import FAST_PATH_ENABLED, FAST_PATH_MAX_BYTES, FastPath
+from metrics import (
+    CRAWL_SECONDS, CRAWLS_IN_FLIGHT, ERRORS, PAGES, RENDER_SECONDS, SITE_CRAWLS_IN_FLIGHT, SITE_SECONDS,
+    metrics_endpoint, register_stats,
+)
+from output_files import OutputFiles
+from output_store import OutputStore
+from profiling import ProfilingBusy, RequestProfile, current_profile, profiling_allowed, unprofiled_work_async
+from site_crawl import MAX_SITE_PAGES, crawl_site, fetch_sitemap_urls
+from throttle import CrawlThrottle
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 mcp = FastMCP()
 OUTPUT_DIR = "output"
+# Index of the content-addressed files in OUTPUT_DIR (kept outside the served directory)
+OUTPUT_INDEX_DB = os.getenv("OUTPUT_INDEX_DB", os.path.join(CRAWL_CACHE_DIR, "output_index.db"))
+
+# Warm browsers shared by all tool calls instead of launching one per crawl
+crawler_pool = CrawlerPool()
+# Global and per-host limits applied to every crawl
+crawl_throttle = CrawlThrottle()
+# On-disk cache of crawled pages, revalidated with conditional requests
+crawl_cache = CrawlCache() if CRAWL_CACHE_ENABLED else None
+# Shared keep-alive client for fast-path fetches and conditional revalidation requests
+http_client = httpx.AsyncClient(follow_redirects=True, timeout=30)
+# Plain HTTP fetch + HTML-to-Markdown for server-rendered pages; the browser handles the rest
+fast_path = FastPath(http_client) if FAST_PATH_ENABLED else None
+# Crawled Markdown is stored by content hash: identical pages share a file and writes never collide
+output_store = OutputStore(OUTPUT_DIR, OUTPUT_INDEX_DB)
+# Maximum number of URLs accepted by one crawl_many_tool call
+MAX_BATCH_URLS = int(os.getenv("MAX_BATCH_URLS", "100"))
+# Largest slice returned by one read_crawl_output call
+MAX_READ_BYTES = int(os.getenv("MAX_READ_BYTES", str(1024 * 1024)))
+
+def build_public_url(relative_path: str) -> str:
+    """Public /output URL of a file saved under OUTPUT_DIR."""
+    host = os.getenv("PUBLIC_HOST", "localhost")
+    port = os.getenv("PORT", "8002")
+    return f"http://{host}:{port}/output/{quote(relative_path)}"
+
+async def render_markdown(url: str, page: Optional[dict] = None):
+    """Fetch a page and return the crawl4ai result.
+
+    Server-rendered pages are converted straight from their HTML; pages that look
+    JavaScript-rendered (or that the fast path cannot fetch) are rendered in a pooled browser.
+    page is a body already fetched by revalidate(); the fast path converts it instead of
+    fetching the page again.
+    """
+    async with crawl_throttle.limit(url):
+        if fast_path is not None:
+            start = time.perf_counter()
+            if page is not None:
+                result = await fast_path.convert(page["url"], page["html"], page["headers"])
+            else:
+                result = await fast_path.fetch(url)
+            if result is not None:
+                RENDER_SECONDS.labels("fast").observe(time.perf_counter() - start)
+                PAGES.labels("fast").inc()
+                return result
+        # The browser goes back to the pool as soon as the page is rendered
+        async with crawler_pool.acquire() as crawler:
+            start = time.perf_counter()
+            result = await crawler.arun(url=url)
+        RENDER_SECONDS.labels("browser").observe(time.perf_counter() - start)
+        PAGES.labels("browser").inc()
+        return result
+
+async def fetch_markdown(url: str, force_refresh: bool = False) -> tuple:
+    """Return (markdown, cache_status), rendering the page only when the cache cannot answer.
+
+    cache_status is "fresh" (served within the TTL), "revalidated" (origin confirmed it is
+    unchanged), "miss" (rendered) or "bypass" (cache disabled).
+    """
+    if crawl_cache is None:
+        result = await render_markdown(url)
+        return result.markdown, "bypass"
+    
+    entry = None if force_refresh else crawl_cache.get(url)
+    validators = {}
+    page = None
+    if entry is not None:
+        if entry["fresh"]:
+            crawl_cache.counters["fresh"] += 1
+            return entry["markdown"], "fresh"
+        try:
+            async with crawl_throttle.limit(url):
+                unchanged, validators, page = await revalidate(http_client, entry, FAST_PATH_MAX_BYTES)
+        except httpx.HTTPError as e:
+            logger.warning(f"Revalidation of {url} failed, rendering instead: {str(e)}")
+            unchanged = False
+        if unchanged:
+            crawl_cache.touch(url, **validators)
+            crawl_cache.counters["revalidated"] += 1
+            return entry["markdown"], "revalidated"
+    
+    result = await render_markdown(url, page)
+    crawl_cache.counters["miss"] += 1
+    if result.success and result.markdown is not None:
+        headers = {key.lower(): value for key, value in (result.response_headers or {}).items()}
+        crawl_cache.put(
+            url,
+            str(result.markdown),
+            etag=validators.get("etag") or headers.get("etag"),
+            last_modified=validators.get("last_modified") or headers.get("last-modified"),
+            # Browser-rendered HTML rarely matches the origin's body, so those pages only
+            # revalidate via etag/last_modified; fast-path HTML is the body itself
+            content_hash=validators.get("content_hash") or (hash_html(result.html) if result.html else None),
+        )
+    return result.markdown, "miss"
+
+def store_markdown(markdown: str, url: str) -> dict:
+    """Save crawled Markdown in the output store, as the "store" stage of a profiled crawl.
+
+    Runs in a worker thread, so the stage is entered there: before Python 3.12 a profiler
+    only sees the thread that started it.
+    """
+    profile = current_profile.get()
+    with profile.stage("store") if profile else nullcontext():
+        return output_store.put_bytes(markdown.encode("utf-8"), ".md", "crawl", url)
+
+async def crawl_url(url: str, force_refresh: bool = False) -> dict:
+    """Crawl one URL, save its Markdown to OUTPUT_DIR and return the tool result."""
+    start = time.perf_counter()
+    cache_status = "error"
+    profile = current_profile.get()
+    try:
+        # Held back while a profiled crawl runs alone; a no-op inside the profiled crawl
+        async with unprofiled_work_async():
+            with CRAWLS_IN_FLIGHT.track_inprogress():
+                with profile.stage("fetch") if profile else nullcontext():
+                    markdown_content, cache_status = await fetch_markdown(url, force_refresh)
+                stored = await asyncio.to_thread(store_markdown, markdown_content, url)
+        output_path = os.path.join(OUTPUT_DIR, stored["file_name"])
+        public_url = build_public_url(stored["file_name"])
+        logger.info(f"Generated Markdown file at {output_path}, download URL: {public_url}")
+        return {
+            "status": "success",
+            "output_file": output_path,
+            "markdown": markdown_content,
+            "download_url": public_url,
+            "bytes": stored["size"],
+            "cache": cache_status
+        }
+    except Exception as e:
+        cache_status = "error"
+        ERRORS.labels("crawl").inc()
+        logger.error(f"Error crawling {url}: {str(e)}")
+        return {"status": "error", "message": str(e)}
+    finally:
+        CRAWL_SECONDS.labels(cache_status).observe(time.perf_counter() - start)
 
 @mcp.tool()
-async def crawl_website_tool(url: str) -> dict:
-    """Crawl a website and save its content as Markdown."""
+async def crawl_website_tool(url: str, force_refresh: bool = False, include_markdown: bool = True,
+                             profile: bool = False, admin_token: str = "") -> dict:
+    """Crawl a website and save its content as Markdown.
+
+    Unchanged pages are served from the crawl cache; set force_refresh=True to render the
+    page again regardless. With include_markdown=False only metadata, the byte count and
+    the download_url are returned; read the file with read_crawl_output instead.
+    Admins can set profile=True (with admin_token) to record a CPU and allocation profile
+    of the fetch and store stages; the result then includes profile_url.
+    """
     logger.info(f"crawl_website_tool called with url: {url}")
+    if profile:
+        if not profiling_allowed(admin_token):
+            logger.error("Profiling requested without a valid admin token")
+            return {"status": "error", "message": "Profiling requires a valid admin token"}
+        result = await profile_crawl(url, force_refresh)
+    else:
+        result = await crawl_url(url, force_refresh)
+    if not include_markdown:
+        result.pop("markdown", None)
+    return result
+
+async def profile_crawl(url: str, force_refresh: bool) -> dict:
+    """Crawl one URL while profiling it; the report and pstats data are stored next to the output.
+
+    The crawl starts once running crawls have finished, and others wait until it is done.
+    If another capture is running, the URL is crawled without profiling and the result's
+    "profile" entry carries the error, as for profiled conversions.
+    """
+    request_profile = RequestProfile("crawl", url)
     try:
-        async with AsyncWebCrawler() as crawler:
-            result = await crawler.arun(url=url)
-            markdown_content = result.markdown
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"crawl_{timestamp}.md"
-            output_path = os.path.join(OUTPUT_DIR, filename)
-            os.makedirs(OUTPUT_DIR, exist_ok=True)
-            with open(output_path, "w", encoding="utf-8") as f:
-                f.write(markdown_content)
-            host = os.getenv("PUBLIC_HOST", "localhost")
-            port = os.getenv("PORT", "8002")
-            public_url = f"http://{host}:{port}/output/{quote(filename)}"
-            logger.info(f"Generated Markdown file at {output_path}, download URL: {public_url}")
-            return {
-                "status": "success",
-                "output_file": output_path,
-                "markdown": markdown_content,
-                "download_url": public_url
-            }
+        async with request_profile.capture_async():
+            result = await crawl_url(url, force_refresh)
+    except ProfilingBusy as e:
+        logger.warning(f"Crawling {url} without profiling: {str(e)}")
+        result = await crawl_url(url, force_refresh)
+        result["profile"] = {"status": "error", "message": str(e)}
+        return result
+    saved = await asyncio.to_thread(request_profile.save, output_store)
+    result["profile_url"] = build_public_url(saved["report"]["file_name"])
+    if "data" in saved:
+        result["profile_data_url"] = build_public_url(saved["data"]["file_name"])
+    return result
+
+def resolve_output_file(file: str) -> str:
+    """Map an output_file or /output-relative path to a file inside OUTPUT_DIR."""
+    relative = file.replace("\\", "/").lstrip("/")
+    prefix = OUTPUT_DIR.rstrip("/") + "/"
+    if relative.startswith(prefix):
+        relative = relative[len(prefix):]
+    root = os.path.realpath(OUTPUT_DIR)
+    path = os.path.realpath(os.path.join(root, relative))
+    if not path.startswith(root + os.sep):
+        raise ValueError(f"'{file}' is outside the output directory")
+    return path
+
+def utf8_boundary(data: bytes, index: int) -> int:
+    """Move index back to the start of the UTF-8 character it falls in."""
+    while 0 < index < len(data) and data[index] & 0xC0 == 0x80:
+        index -= 1
+    return index
+
+@mcp.tool()
+def read_crawl_output(file: str, offset: int = 0, length: int = 65536) -> dict:
+    """Read a slice of a saved Markdown file, starting offset bytes in and at most length bytes long.
+
+    file is the output_file returned by a crawl tool (or its path under /output). Slices
+    never split a UTF-8 character, so a slice may be up to 3 bytes shorter than length;
+    keep calling with next_offset until eof is true.
+    """
+    logger.info(f"read_crawl_output called with file: {file}, offset: {offset}, length: {length}")
+    try:
+        path = resolve_output_file(file)
+        total = os.path.getsize(path)
+        output_store.touch(os.path.basename(path))
+        # An offset past the end gives an empty slice at EOF
+        offset = min(max(0, offset), total)
+        # At least one whole UTF-8 character (up to 4 bytes) per slice
+        length = max(4, min(length, MAX_READ_BYTES))
+        with open(path, "rb") as f:
+            # Read a few bytes either side so the slice can be moved onto character boundaries
+            start = max(0, offset - 3)
+            f.seek(start)
+            data = f.read(offset - start + length + 1)
+        begin = utf8_boundary(data, offset - start)
+        end = utf8_boundary(data, min(len(data), offset - start + length))
+        content = data[begin:end].decode("utf-8", errors="replace")
+        next_offset = start + end
+        return {
+            "status": "success",
+            "file": os.path.relpath(path, os.path.realpath(OUTPUT_DIR)),
+            "offset": start + begin,
+            "length": end - begin,
+            "content": content,
+            "next_offset": next_offset if next_offset < total else None,
+            "total_bytes": total,
+            "eof": next_offset >= total,
+        }
+    except FileNotFoundError:
+        return {"status": "error", "message": f"File '{file}' not found"}
     except Exception as e:
-        logger.error(f"Error crawling {url}: {str(e)}")
+        ERRORS.labels("read").inc()
+        logger.error(f"Error reading {file}: {str(e)}")
+        return {"status": "error", "message": str(e)}
+
+@mcp.tool()
+async def crawl_many_tool(urls: List[str], force_refresh: bool = False) -> dict:
+    """Crawl several URLs concurrently and save each page as Markdown.
+
+    Returns one compact result per URL (status, output_file, download_url, bytes) in
+    input order; read the Markdown through each download_url.
+    """
+    logger.info(f"crawl_many_tool called with {len(urls)} urls")
+    unique_urls = list(dict.fromkeys(urls))
+    if len(unique_urls) > MAX_BATCH_URLS:
+        return {"status": "error", "message": f"At most {MAX_BATCH_URLS} URLs may be crawled per call"}
+    
+    results = await asyncio.gather(*(crawl_url(url, force_refresh) for url in unique_urls))
+    compact = []
+    for url, result in zip(unique_urls, results):
+        entry = {"url": url, **{key: value for key, value in result.items() if key != "markdown"}}
+        if "markdown" in result:
+            entry["bytes"] = len(result["markdown"].encode("utf-8"))
+        compact.append(entry)
+    succeeded = sum(1 for entry in compact if entry["status"] == "success")
+    return {
+        "status": "success" if succeeded else "error",
+        "succeeded": succeeded,
+        "failed": len(compact) - succeeded,
+        "results": compact,
+    }
+
+@mcp.tool()
+async def crawl_site_tool(url: str, max_depth: int = 2, max_pages: int = 50, use_sitemap: bool = True,
+                          force_refresh: bool = False) -> dict:
+    """Crawl a whole site from a seed URL, following same-site links, and save every page as Markdown.
+
+    Links are followed up to max_depth hops from the seed, for at most max_pages pages;
+    URLs from the site's sitemap.xml are added to the frontier when use_sitemap is set.
+    Every page is saved to /output and listed in a manifest.json; the response returns
+    the manifest URL and page counts.
+    """
+    logger.info(f"crawl_site_tool called with url: {url}, max_depth: {max_depth}, max_pages: {max_pages}")
+    max_pages = max(1, min(max_pages, MAX_SITE_PAGES))
+    crawled_at = datetime.now().isoformat(timespec="seconds")
+    
+    async def fetch(page_url: str) -> dict:
+        return await crawl_url(page_url, force_refresh)
+    
+    start = time.perf_counter()
+    try:
+        with SITE_CRAWLS_IN_FLIGHT.track_inprogress():
+            sitemap_urls = await fetch_sitemap_urls(http_client, url) if use_sitemap else None
+            pages = await crawl_site(url, fetch, max_depth=max_depth, max_pages=max_pages, sitemap_urls=sitemap_urls)
+    except Exception as e:
+        ERRORS.labels("site").inc()
+        logger.error(f"Error crawling site {url}: {str(e)}")
         return {"status": "error", "message": str(e)}
+    finally:
+        SITE_SECONDS.observe(time.perf_counter() - start)
+    
+    succeeded = sum(1 for page in pages if page["status"] == "success")
+    manifest = {
+        "seed_url": url,
+        "max_depth": max_depth,
+        "max_pages": max_pages,
+        "sitemap_urls": len(sitemap_urls or []),
+        "crawled_at": crawled_at,
+        "pages": pages,
+    }
+    stored = await asyncio.to_thread(
+        output_store.put_bytes, json.dumps(manifest, indent=2).encode("utf-8"), ".json", "crawl_site", url
+    )
+    manifest_path = os.path.join(OUTPUT_DIR, stored["file_name"])
+    logger.info(f"Site crawl of {url} saved {succeeded} pages, manifest at {manifest_path}")
+    return {
+        "status": "success" if succeeded else "error",
+        "pages": len(pages),
+        "succeeded": succeeded,
+        "failed": len(pages) - succeeded,
+        "manifest_file": manifest_path,
+        "manifest_url": build_public_url(stored["file_name"]),
+    }
+
+@mcp.tool()
+def crawler_pool_stats() -> dict:
+    """Report the browser pool size, idle browsers, pages served and recycles."""
+    return crawler_pool.stats()
+
+@mcp.tool()
+def crawl_path_stats() -> dict:
+    """Report how many pages took the HTTP fast path and how many fell back to the browser, and why."""
+    if fast_path is None:
+        return {"status": "error", "message": "HTTP fast path is disabled"}
+    return fast_path.stats()
+
+@mcp.tool()
+def output_store_stats() -> dict:
+    """Report stored artifacts, bytes used against the disk budget, dedupes and GC evictions."""
+    return output_store.stats()
+
+@mcp.tool()
+def crawl_cache_stats() -> dict:
+    """Report crawl cache size and fresh/revalidated/miss/evicted counters."""
+    if crawl_cache is None:
+        return {"status": "error", "message": "Crawl cache is disabled"}
+    return crawl_cache.stats()
+
+def add_crawler_pool_lifespan(app):
+    """Start the crawler pool with the server; close its browsers and HTTP connections on shutdown."""
+    mcp_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app):
+        await crawler_pool.start()
+        try:
+            async with mcp_lifespan(app) as state:
+                yield state
+        finally:
+            await crawler_pool.stop()
+            await http_client.aclose()
+
+    app.router.lifespan_context = lifespan
 
 def main():
     app = mcp.streamable_http_app()
     if app is None:
         raise AttributeError("streamable_http_app() returned None")
+    add_crawler_pool_lifespan(app)
     """Run the MCP website crawling server."""
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", "8002"))
@@ -53,7 +403,10 @@ def main():
     logger.info("MCP endpoint will be available at the server URL + /mcp")
 
     os.makedirs(OUTPUT_DIR, exist_ok=True)
-    app.mount("/output", StaticFiles(directory=OUTPUT_DIR), name="output")
+    app.mount("/output", OutputFiles(output_store), name="output")
+    # Prometheus metrics; the store, pool and fast-path figures are read at scrape time
+    register_stats(output_store, crawler_pool, fast_path)
+    app.add_route("/metrics", metrics_endpoint, methods=["GET"])
     uvicorn.run(app, host=host, port=port, log_level="info", loop="asyncio")
 
 if __name__ == "__main__":
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig
+
+logger = logging.getLogger(__name__)
+
+# Number of warm browsers kept ready for crawl requests
+CRAWLER_POOL_SIZE = int(os.getenv("CRAWLER_POOL_SIZE", "2"))
+# Restart a browser after it has served this many pages, to bound memory growth
+CRAWLER_RECYCLE_AFTER = int(os.getenv("CRAWLER_RECYCLE_AFTER", "100"))
+
+
+class PooledCrawler:
+    """A started AsyncWebCrawler plus the bookkeeping the pool needs to recycle it."""
+
+    def __init__(self, crawler: AsyncWebCrawler):
+        self.crawler = crawler
+        self.pages = 0
+        self.started_at = time.time()
+        self.failed = False
+
+    def is_healthy(self) -> bool:
+        if self.failed:
+            return False
+        browser_manager = getattr(self.crawler.crawler_strategy, "browser_manager", None)
+        browser = getattr(browser_manager, "browser", None)
+        # Managed/CDP browsers do not expose a Browser object; trust them until a crawl fails
+        return browser is None or browser.is_connected()
+
+
+class CrawlerPool:
+    """Long-lived pool of headless browsers shared by all crawl tool calls."""
+
+    def __init__(self, size: int = CRAWLER_POOL_SIZE, recycle_after: int = CRAWLER_RECYCLE_AFTER,
+                 browser_config: Optional[BrowserConfig] = None):
+        self.size = size
+        self.recycle_after = recycle_after
+        self.browser_config = browser_config or BrowserConfig(headless=True, verbose=False)
+        self._idle: Optional[asyncio.Queue] = None
+        self._all = set()
+        self._start_lock = asyncio.Lock()
+        self.recycled = 0
+        self.pages = 0
+
+    async def _launch(self) -> PooledCrawler:
+        crawler = AsyncWebCrawler(config=self.browser_config)
+        await crawler.start()
+        pooled = PooledCrawler(crawler)
+        self._all.add(pooled)
+        return pooled
+
+    async def _close(self, pooled: PooledCrawler) -> None:
+        self._all.discard(pooled)
+        try:
+            await pooled.crawler.close()
+        except Exception as e:
+            logger.warning(f"Error closing crawler: {str(e)}")
+
+    async def start(self) -> None:
+        """Launch all browsers; called once at server startup (or lazily on first use)."""
+        async with self._start_lock:
+            if self._idle is not None:
+                return
+            idle = asyncio.Queue()
+            launched = await asyncio.gather(*(self._launch() for _ in range(self.size)))
+            for pooled in launched:
+                idle.put_nowait(pooled)
+            self._idle = idle
+        logger.info(f"Crawler pool started with {self.size} browsers")
+
+    async def stop(self) -> None:
+        """Close every browser in the pool."""
+        async with self._start_lock:
+            if self._idle is None:
+                return
+            self._idle = None
+            await asyncio.gather(*(self._close(pooled) for pooled in list(self._all)))
+        logger.info("Crawler pool stopped")
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Borrow a healthy crawler; it is recycled after a failure or recycle_after pages."""
+        if self._idle is None:
+            await self.start()
+        idle = self._idle
+        pooled = await idle.get()
+        try:
+            if not pooled.is_healthy() or pooled.pages >= self.recycle_after:
+                try:
+                    pooled = await self._recycle(pooled)
+                except Exception:
+                    # Keep the slot; the next borrower retries the launch
+                    pooled.failed = True
+                    raise
+            try:
+                yield pooled.crawler
+            except Exception:
+                pooled.failed = True
+                raise
+            finally:
+                pooled.pages += 1
+                self.pages += 1
+        finally:
+            if self._idle is idle:
+                idle.put_nowait(pooled)
+            else:
+                # The pool was stopped while this crawler was borrowed
+                await self._close(pooled)
+
+    async def _recycle(self, pooled: PooledCrawler) -> PooledCrawler:
+        logger.info(f"Recycling crawler after {pooled.pages} pages (healthy={pooled.is_healthy()})")
+        await self._close(pooled)
+        self.recycled += 1
+        return await self._launch()
+
+    async def arun(self, url: str, config: Optional[CrawlerRunConfig] = None):
+        async with self.acquire() as crawler:
+            return await crawler.arun(url=url, config=config)
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+            "started": self._idle is not None,
+            "pages": self.pages,
+            "recycled": self.recycled,
+            "recycle_after": self.recycle_after,
+        }
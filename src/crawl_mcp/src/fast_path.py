@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import os
+import re
+from typing import Optional
+
+import httpx
+from crawl4ai import CrawlerRunConfig
+from crawl4ai.markdown_generation_strategy import DefaultMarkdownGenerator
+from crawl4ai.models import CrawlResult
+
+logger = logging.getLogger(__name__)
+
+# Try a plain HTTP fetch before rendering a page in the browser
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+# Pages with less visible text than this are assumed to be rendered by JavaScript
+FAST_PATH_MIN_TEXT = int(os.getenv("FAST_PATH_MIN_TEXT", "200"))
+# Larger responses are left to the browser rather than converted in-process
+FAST_PATH_MAX_BYTES = int(os.getenv("FAST_PATH_MAX_BYTES", str(5 * 1024 * 1024)))
+
+HTML_TYPES = ("text/html", "application/xhtml+xml")
+# Markers of client-side rendered apps: empty mount points and "enable JavaScript" notices
+SPA_MARKERS = re.compile(
+    r"<div[^>]+id=[\"'](?:root|app|__next|__nuxt|svelte)[\"'][^>]*>\s*</div>"
+    r"|<app-root[^>]*>\s*</app-root>"
+    r"|<noscript[^>]*>[^<]*(?:enable|requires?|need)\s+javascript",
+    re.IGNORECASE,
+)
+_TAGS = re.compile(r"<(script|style|noscript|template)\b.*?</\1\s*>|<[^>]+>", re.IGNORECASE | re.DOTALL)
+
+
+def visible_text_length(html: str) -> int:
+    """Rough count of the non-whitespace text a reader would see, ignoring scripts and styles."""
+    return len(re.sub(r"\s+", "", _TAGS.sub(" ", html)))
+
+
+def content_type(headers) -> str:
+    """Media type of a response, without parameters such as charset."""
+    return headers.get("content-type", "").split(";")[0].strip().lower()
+
+
+def needs_browser(html: str, min_text: int = FAST_PATH_MIN_TEXT) -> Optional[str]:
+    """Return why the page looks JavaScript-rendered, or None if its HTML can be used as is."""
+    if SPA_MARKERS.search(html):
+        return "spa_marker"
+    if visible_text_length(html) < min_text:
+        return "empty_body"
+    return None
+
+
+def html_to_markdown(url: str, html: str) -> CrawlResult:
+    """Convert fetched HTML with the same scraping and Markdown steps crawl4ai applies after rendering."""
+    config = CrawlerRunConfig()
+    params = dict(config.__dict__)
+    params.pop("url", None)
+    scraped = config.scraping_strategy.scrap(url, html, **params)
+    markdown = DefaultMarkdownGenerator().generate_markdown(input_html=scraped.cleaned_html, base_url=url)
+    return CrawlResult(
+        url=url,
+        html=html,
+        cleaned_html=scraped.cleaned_html,
+        links=scraped.links.model_dump(),
+        metadata=scraped.metadata,
+        markdown=markdown,
+        success=True,
+        status_code=200,
+    )
+
+
+class FastPath:
+    """Fetch pages over plain HTTP and convert them to Markdown, leaving JS-rendered pages to the browser."""
+
+    def __init__(self, client: httpx.AsyncClient, min_text: int = FAST_PATH_MIN_TEXT,
+                 max_bytes: int = FAST_PATH_MAX_BYTES):
+        self.client = client
+        self.min_text = min_text
+        self.max_bytes = max_bytes
+        self.counters = {"fast": 0, "browser": 0}
+        self.fallback_reasons = {}
+
+    def _fallback(self, url: str, reason: str) -> None:
+        self.counters["browser"] += 1
+        self.fallback_reasons[reason] = self.fallback_reasons.get(reason, 0) + 1
+        logger.info(f"Falling back to the browser for {url}: {reason}")
+
+    async def fetch(self, url: str) -> Optional[CrawlResult]:
+        """Return a crawl result built from the raw HTML, or None if the page needs the browser."""
+        try:
+            async with self.client.stream("GET", url) as response:
+                if response.status_code != 200:
+                    self._fallback(url, f"http_{response.status_code}")
+                    return None
+                if content_type(response.headers) not in HTML_TYPES:
+                    self._fallback(url, "not_html")
+                    return None
+                length = response.headers.get("content-length")
+                if length and length.isdigit() and int(length) > self.max_bytes:
+                    self._fallback(url, "too_large")
+                    return None
+                body = bytearray()
+                async for chunk in response.aiter_bytes():
+                    body.extend(chunk)
+                    if len(body) > self.max_bytes:
+                        self._fallback(url, "too_large")
+                        return None
+                html = bytes(body).decode(response.encoding or "utf-8", errors="replace")
+                headers = dict(response.headers)
+                final_url = str(response.url)
+        except httpx.HTTPError as e:
+            self._fallback(url, "fetch_error")
+            logger.debug(f"Fast path fetch of {url} failed: {str(e)}")
+            return None
+        return await self.convert(final_url, html, headers)
+
+    async def convert(self, url: str, html: str, headers: dict) -> Optional[CrawlResult]:
+        """Like fetch(), for a 200 response already read (e.g. by cache revalidation)."""
+        if content_type(headers) not in HTML_TYPES:
+            self._fallback(url, "not_html")
+            return None
+        reason = needs_browser(html, self.min_text)
+        if reason:
+            self._fallback(url, reason)
+            return None
+        # Scraping is CPU-bound; keep it off the event loop
+        result = await asyncio.to_thread(html_to_markdown, url, html)
+        result.response_headers = headers
+        self.counters["fast"] += 1
+        return result
+
+    def stats(self) -> dict:
+        total = self.counters["fast"] + self.counters["browser"]
+        return {
+            **self.counters,
+            "fast_ratio": round(self.counters["fast"] / total, 3) if total else None,
+            "fallback_reasons": dict(self.fallback_reasons),
+            "min_text": self.min_text,
+        }
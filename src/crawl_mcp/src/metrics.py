@@ -0,0 +1,63 @@
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+from starlette.requests import Request
+from starlette.responses import Response
+
+# From cache hits (milliseconds) to slow pages rendered in the browser, and whole-site crawls
+SECONDS_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+CRAWL_SECONDS = Histogram(
+    "crawl_seconds", "Time to crawl and store one URL, by cache status (fresh, revalidated, miss, bypass, error)",
+    ["cache"], buckets=SECONDS_BUCKETS,
+)
+RENDER_SECONDS = Histogram(
+    "crawl_render_seconds", "Time to fetch and convert a page, by path (fast, browser)", ["path"],
+    buckets=SECONDS_BUCKETS,
+)
+SITE_SECONDS = Histogram("crawl_site_seconds", "Time to crawl a whole site", buckets=SECONDS_BUCKETS)
+CRAWLS_IN_FLIGHT = Gauge("crawl_in_flight", "URL crawls currently running")
+SITE_CRAWLS_IN_FLIGHT = Gauge("crawl_site_in_flight", "Site crawls currently running")
+PAGES = Counter("crawl_pages", "Pages fetched and converted, by path (fast, browser)", ["path"])
+ERRORS = Counter("crawl_errors", "Failures by stage (crawl, site, read)", ["stage"])
+
+
+class StatsCollector(Collector):
+    """Expose the output store, browser pool and fast-path counters, read when /metrics is scraped."""
+
+    def __init__(self, output_store, crawler_pool, fast_path=None):
+        self.output_store = output_store
+        self.crawler_pool = crawler_pool
+        self.fast_path = fast_path
+
+    def collect(self):
+        stats = self.output_store.stats()
+        yield GaugeMetricFamily("crawl_output_artifacts", "Artifacts in the output store", value=stats["artifacts"])
+        yield GaugeMetricFamily("crawl_output_disk_bytes", "Bytes on disk used by the output store",
+                                value=stats["disk_bytes"])
+        yield CounterMetricFamily("crawl_output_written_bytes", "Bytes written to the output store",
+                                  value=stats["bytes_written"])
+        yield CounterMetricFamily("crawl_output_deduped", "Stored outputs that matched an existing artifact",
+                                  value=stats["deduped"])
+        yield CounterMetricFamily("crawl_output_evictions", "Artifacts deleted by the output store GC",
+                                  value=stats["evictions"])
+        pool = self.crawler_pool.stats()
+        yield GaugeMetricFamily("crawl_browsers", "Browsers in the pool", value=pool["size"])
+        yield GaugeMetricFamily("crawl_browsers_idle", "Idle browsers in the pool", value=pool["idle"])
+        yield CounterMetricFamily("crawl_browser_recycles", "Browsers restarted after serving their page quota",
+                                  value=pool["recycled"])
+        if self.fast_path is not None:
+            fallbacks = CounterMetricFamily("crawl_fast_path_fallbacks", "Fast-path fetches handed to the browser",
+                                            labels=["reason"])
+            for reason, count in self.fast_path.stats()["fallback_reasons"].items():
+                fallbacks.add_metric([reason], count)
+            yield fallbacks
+
+
+def register_stats(output_store, crawler_pool, fast_path=None) -> None:
+    REGISTRY.register(StatsCollector(output_store, crawler_pool, fast_path))
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    """Prometheus text exposition of every metric in the default registry."""
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
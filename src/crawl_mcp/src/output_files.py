@@ -0,0 +1,124 @@
+import asyncio
+import hashlib
+import mimetypes
+import os
+import stat
+from email.utils import formatdate
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, PlainTextResponse, Response
+from starlette.types import Receive, Scope, Send
+
+mimetypes.add_type("text/markdown", ".md")
+
+# Content-addressed artifacts never change, so clients may keep them for a year
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def parse_accept_encoding(value: str) -> dict:
+    """Map each coding in an Accept-Encoding header to its q-value."""
+    codings = {}
+    for item in value.split(","):
+        coding, _, params = item.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[coding.strip().lower()] = q
+    return codings
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag, as used for 304s."""
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return etag.removeprefix("W/") in (tag.removeprefix("W/") for tag in tags)
+
+
+class OutputFiles:
+    """Serve /output from an OutputStore, replacing StaticFiles.
+
+    Content-addressed artifacts get strong ETags derived from their hash, long-lived
+    caching and precompressed gzip/brotli variants chosen by Accept-Encoding. All files
+    answer If-None-Match with 304 and support Range requests (served uncompressed).
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.root = os.path.realpath(store.root)
+
+    def _resolve(self, scope: Scope):
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        relative = os.path.normpath(path.lstrip("/"))
+        full_path = os.path.realpath(os.path.join(self.root, relative))
+        if not full_path.startswith(self.root + os.sep):
+            return None, None
+        return relative, full_path
+
+    def _choose_encoding(self, headers: Headers, file_name: str):
+        if "range" in headers or not self.store.is_artifact(file_name):
+            return None
+        codings = parse_accept_encoding(headers.get("accept-encoding", ""))
+        best = None
+        for encoding in ("br", "gzip"):
+            q = codings.get(encoding, codings.get("*", 0.0))
+            if q > 0 and (best is None or q > best[1]) and os.path.exists(self.store.variant_path(file_name, encoding)):
+                best = (encoding, q)
+        return best[0] if best else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return
+        if scope["method"] not in ("GET", "HEAD"):
+            await PlainTextResponse("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"})(scope, receive, send)
+            return
+        relative, full_path = self._resolve(scope)
+        try:
+            stat_result = os.stat(full_path) if full_path else None
+        except (FileNotFoundError, NotADirectoryError):
+            stat_result = None
+        if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+            await PlainTextResponse("Not Found", status_code=404)(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        file_name = os.path.basename(relative)
+        media_type = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+        if media_type.startswith("text/"):
+            media_type += "; charset=utf-8"
+        encoding = self._choose_encoding(headers, file_name)
+        response_headers = {"vary": "Accept-Encoding", "last-modified": formatdate(stat_result.st_mtime, usegmt=True)}
+        if self.store.is_artifact(file_name):
+            digest = file_name.split(".", 1)[0]
+            # Each representation needs its own strong validator
+            etag = f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+            response_headers["cache-control"] = IMMUTABLE_CACHE_CONTROL
+            await asyncio.to_thread(self.store.touch, file_name)
+        else:
+            etag_base = f"{stat_result.st_mtime}-{stat_result.st_size}"
+            etag = f'"{hashlib.md5(etag_base.encode(), usedforsecurity=False).hexdigest()}"'
+            response_headers["cache-control"] = "no-cache"
+        response_headers["etag"] = etag
+
+        if_none_match = headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, etag):
+            await Response(status_code=304, headers=response_headers)(scope, receive, send)
+            return
+
+        if encoding:
+            response_headers["content-encoding"] = encoding
+            response = FileResponse(self.store.variant_path(file_name, encoding), headers=response_headers,
+                                    media_type=media_type)
+        else:
+            response = FileResponse(full_path, headers=response_headers, media_type=media_type,
+                                    stat_result=stat_result)
+        await response(scope, receive, send)
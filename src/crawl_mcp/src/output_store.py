@@ -0,0 +1,311 @@
+import gzip
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Iterable, Optional
+
+try:
+    import brotli
+except ImportError:  # serve gzip variants only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Disk budget for stored artifacts; least-recently-used ones are deleted beyond it
+OUTPUT_MAX_BYTES = int(os.getenv("OUTPUT_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+# Artifacts written or read more recently than this are never deleted by the GC
+OUTPUT_GC_MIN_AGE = int(os.getenv("OUTPUT_GC_MIN_AGE", "300"))
+# Save gzip/brotli copies of each artifact so downloads can be served compressed
+OUTPUT_PRECOMPRESS = os.getenv("OUTPUT_PRECOMPRESS", "true").lower() == "true"
+# Smaller artifacts are not worth compressing
+OUTPUT_COMPRESS_MIN_BYTES = int(os.getenv("OUTPUT_COMPRESS_MIN_BYTES", "1024"))
+CHUNK_SIZE = 1024 * 1024
+# Content-Encoding -> file suffix of the precompressed variant, in order of preference
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+_ARTIFACT_NAME = re.compile(r"^([0-9a-f]{64})(\.[A-Za-z0-9]+)$")
+
+
+class OutputStore:
+    """Content-addressed store of generated artifacts, with an SQLite index and an LRU disk budget.
+
+    Every artifact is saved once as <sha256><ext> in the output directory, so identical
+    outputs share one file and concurrent writers can never clobber each other. gzip and
+    brotli copies (<sha256><ext>.gz / .br) are written next to it for compressed downloads.
+    The index also records which source/name produced each artifact.
+    """
+
+    def __init__(self, root: str, index_path: str, max_bytes: int = OUTPUT_MAX_BYTES,
+                 min_age: int = OUTPUT_GC_MIN_AGE, precompress: bool = OUTPUT_PRECOMPRESS):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.min_age = min_age
+        self.precompress = precompress
+        self.deduped = 0
+        self.evictions = 0
+        self.bytes_written = 0
+        os.makedirs(root, exist_ok=True)
+        index_dir = os.path.dirname(index_path)
+        if index_dir:
+            os.makedirs(index_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(index_path, check_same_thread=False, timeout=30)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS artifacts ("
+            " file_name TEXT PRIMARY KEY,"
+            " sha256 TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " disk_bytes INTEGER,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " source TEXT NOT NULL,"
+            " name TEXT NOT NULL,"
+            " file_name TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (source, name, file_name))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS artifacts_last_access ON artifacts (last_access)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_file_name ON entries (file_name)")
+        self._db.commit()
+        self._index_existing()
+        # Running total of disk_bytes, kept up to date by _commit and the GC so writes need not sum the index
+        self._disk_bytes = self._db.execute(
+            "SELECT COALESCE(SUM(COALESCE(disk_bytes, size)), 0) FROM artifacts"
+        ).fetchone()[0]
+
+    def _index_existing(self) -> None:
+        """Adopt artifacts already on disk when the index is new (e.g. it was lost or moved)."""
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM artifacts LIMIT 1").fetchone():
+                return
+            now = time.time()
+            adopted = 0
+            for file_name in os.listdir(self.root):
+                match = _ARTIFACT_NAME.match(file_name)
+                if not match:
+                    continue
+                size = os.path.getsize(os.path.join(self.root, file_name))
+                self._db.execute(
+                    "INSERT OR IGNORE INTO artifacts (file_name, sha256, size, disk_bytes, created_at, last_access)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (file_name, match.group(1), size, size + self._variant_bytes(file_name), now, now),
+                )
+                adopted += 1
+            self._db.commit()
+        if adopted:
+            logger.info(f"Indexed {adopted} existing artifacts in {self.root}")
+
+    def path(self, file_name: str) -> str:
+        return os.path.join(self.root, file_name)
+
+    def is_artifact(self, file_name: str) -> bool:
+        """True if file_name is a content-addressed artifact (its name is its SHA-256)."""
+        return _ARTIFACT_NAME.match(file_name) is not None
+
+    def variant_path(self, file_name: str, encoding: str) -> str:
+        return self.path(file_name + ENCODINGS[encoding])
+
+    def _variant_bytes(self, file_name: str) -> int:
+        total = 0
+        for encoding in ENCODINGS:
+            try:
+                total += os.path.getsize(self.variant_path(file_name, encoding))
+            except FileNotFoundError:
+                pass
+        return total
+
+    def _compress(self, file_name: str, size: int) -> int:
+        """Write the precompressed variants of an artifact; returns their total size."""
+        if not self.precompress or size < OUTPUT_COMPRESS_MIN_BYTES:
+            return 0
+        path = self.path(file_name)
+        total = 0
+        for encoding in ENCODINGS:
+            if encoding == "br" and brotli is None:
+                continue
+            fd, tmp_path = tempfile.mkstemp(prefix=".store_", suffix=".tmp", dir=self.root)
+            with os.fdopen(fd, "wb") as dst, open(path, "rb") as src:
+                if encoding == "gzip":
+                    # mtime=0 keeps the variant byte-identical for identical content
+                    with gzip.GzipFile(fileobj=dst, mode="wb", compresslevel=9, mtime=0) as gz:
+                        for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                            gz.write(chunk)
+                else:
+                    compressor = brotli.Compressor(quality=9)
+                    for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                        dst.write(compressor.process(chunk))
+                    dst.write(compressor.finish())
+            variant_size = os.path.getsize(tmp_path)
+            if variant_size >= size:
+                # Incompressible content is always served as is
+                os.remove(tmp_path)
+                continue
+            os.replace(tmp_path, self.variant_path(file_name, encoding))
+            total += variant_size
+        return total
+
+    def put_bytes(self, data: bytes, ext: str = ".md", source: str = "", name: str = "") -> dict:
+        """Store data (once per distinct content) and record that source/name produced it."""
+        fd, tmp_path = tempfile.mkstemp(prefix=".store_", suffix=".tmp", dir=self.root)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return self._commit(tmp_path, hashlib.sha256(data).hexdigest(), len(data), ext, source, name)
+
+    def put_file(self, src_path: str, ext: str = ".md", source: str = "", name: str = "") -> dict:
+        """Copy a file into the store, hashing it while it is copied."""
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(prefix=".store_", suffix=".tmp", dir=self.root)
+        with os.fdopen(fd, "wb") as dst, open(src_path, "rb") as src:
+            for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+                size += len(chunk)
+                dst.write(chunk)
+        return self._commit(tmp_path, digest.hexdigest(), size, ext, source, name)
+
+    def put_chunks(self, chunks: Iterable[bytes], ext: str = ".md", source: str = "", name: str = "") -> dict:
+        """Store data produced incrementally, hashing each chunk as it is written."""
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(prefix=".store_", suffix=".tmp", dir=self.root)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return self._commit(tmp_path, digest.hexdigest(), size, ext, source, name)
+
+    def _commit(self, tmp_path: str, sha256: str, size: int, ext: str, source: str, name: str) -> dict:
+        file_name = f"{sha256}{ext}"
+        path = self.path(file_name)
+        now = time.time()
+        with self._lock:
+            # Checked under the lock so the GC cannot delete the file between the check and the index update
+            deduped = os.path.exists(path)
+            if deduped:
+                os.remove(tmp_path)
+                self.deduped += 1
+            else:
+                os.replace(tmp_path, path)
+            if self._disk_bytes_of(file_name) is None:
+                self._disk_bytes += size
+            self._db.execute(
+                "INSERT INTO artifacts (file_name, sha256, size, disk_bytes, created_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (file_name) DO UPDATE SET last_access = excluded.last_access",
+                (file_name, sha256, size, size, now, now),
+            )
+            self._db.execute(
+                "INSERT INTO entries (source, name, file_name, created_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (source, name, file_name) DO UPDATE SET created_at = excluded.created_at",
+                (source, name, file_name, now),
+            )
+            self._db.commit()
+        if not deduped:
+            # Compressed outside the lock; until the variants exist the file is served uncompressed
+            variant_bytes = self._compress(file_name, size)
+            with self._lock:
+                previous = self._disk_bytes_of(file_name)
+                if previous is not None:
+                    self._disk_bytes += size + variant_bytes - previous
+                self._db.execute(
+                    "UPDATE artifacts SET disk_bytes = ? WHERE file_name = ?", (size + variant_bytes, file_name)
+                )
+                self._db.commit()
+                self.bytes_written += size + variant_bytes
+        with self._lock:
+            self._gc_locked()
+        return {"file_name": file_name, "path": path, "sha256": sha256, "size": size, "deduped": deduped}
+
+    def _disk_bytes_of(self, file_name: str) -> Optional[int]:
+        row = self._db.execute(
+            "SELECT COALESCE(disk_bytes, size) FROM artifacts WHERE file_name = ?", (file_name,)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def touch(self, file_name: str) -> None:
+        """Mark an artifact as recently used so the GC keeps it longer."""
+        with self._lock:
+            self._db.execute("UPDATE artifacts SET last_access = ? WHERE file_name = ?", (time.time(), file_name))
+            self._db.commit()
+
+    def latest(self, source: str, name: str) -> Optional[dict]:
+        """Return the most recent artifact stored for source/name, if it still exists."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT a.file_name, a.sha256, a.size, e.created_at FROM entries e"
+                " JOIN artifacts a ON a.file_name = e.file_name"
+                " WHERE e.source = ? AND e.name = ? ORDER BY e.created_at DESC LIMIT 1",
+                (source, name),
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(row, path=self.path(row["file_name"]))
+
+    def gc(self) -> int:
+        """Delete least-recently-used artifacts until the store fits its disk budget."""
+        with self._lock:
+            return self._gc_locked()
+
+    def _gc_locked(self) -> int:
+        total = self._disk_bytes
+        if total <= self.max_bytes:
+            return 0
+        cutoff = time.time() - self.min_age
+        evicted = 0
+        rows = self._db.execute(
+            "SELECT file_name, COALESCE(disk_bytes, size) AS disk_bytes FROM artifacts"
+            " WHERE last_access < ? ORDER BY last_access", (cutoff,)
+        ).fetchall()
+        for row in rows:
+            if total <= self.max_bytes:
+                break
+            paths = [self.path(row["file_name"])]
+            paths += [self.variant_path(row["file_name"], encoding) for encoding in ENCODINGS]
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self._db.execute("DELETE FROM artifacts WHERE file_name = ?", (row["file_name"],))
+            self._db.execute("DELETE FROM entries WHERE file_name = ?", (row["file_name"],))
+            total -= row["disk_bytes"]
+            evicted += 1
+        self._db.commit()
+        self._disk_bytes = total
+        if evicted:
+            self.evictions += evicted
+            logger.info(f"Output store GC deleted {evicted} artifacts ({total} bytes remain)")
+        return evicted
+
+    def stats(self) -> dict:
+        with self._lock:
+            artifacts, total, disk_bytes = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(COALESCE(disk_bytes, size)), 0) FROM artifacts"
+            ).fetchone()
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {
+            "artifacts": artifacts,
+            "entries": entries,
+            "bytes": total,
+            "disk_bytes": disk_bytes,
+            "max_bytes": self.max_bytes,
+            "deduped": self.deduped,
+            "bytes_written": self.bytes_written,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,268 @@
+import asyncio
+import contextvars
+import cProfile
+import hmac
+import json
+import logging
+import os
+import pstats
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Profiling is allowed only for callers presenting this token; unset disables profiling entirely
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")
+# Functions (by cumulative time) and allocation sites listed per stage in the report
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "30"))
+
+# The profile of the request being handled, if it asked for one
+current_profile: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar(
+    "current_profile", default=None
+)
+# tracemalloc is process-wide, so only one capture runs at a time
+_capture_lock = threading.Lock()
+# How often event-loop code checks whether a profiled request has finished or drained the gate
+_POLL_SECONDS = 0.05
+
+
+class ProfilingBusy(RuntimeError):
+    """Raised when another profiling capture is already running."""
+
+
+class _WorkGate:
+    """Lets work run concurrently, except while a profiled request runs alone.
+
+    Closing the gate holds back new work; the profiled request starts once the work
+    already running has drained and the gate opens again when it ends.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._running = 0
+        self._closed = False
+
+    def try_enter(self) -> bool:
+        with self._cond:
+            if self._closed:
+                return False
+            self._running += 1
+            return True
+
+    def enter(self):
+        with self._cond:
+            self._cond.wait_for(lambda: not self._closed)
+            self._running += 1
+
+    def leave(self):
+        with self._cond:
+            self._running -= 1
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+
+    def drained(self) -> bool:
+        with self._cond:
+            return self._running == 0
+
+    def wait_drained(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._running == 0)
+
+    def open(self):
+        with self._cond:
+            self._closed = False
+            self._cond.notify_all()
+
+
+_gate = _WorkGate()
+
+
+@contextmanager
+def unprofiled_work():
+    """Run the enclosed block as work that never overlaps a profiled request.
+
+    Waits while a profile is being captured; inside the profiled request itself this
+    does nothing.
+    """
+    if current_profile.get() is not None:
+        yield
+        return
+    _gate.enter()
+    try:
+        yield
+    finally:
+        _gate.leave()
+
+
+@asynccontextmanager
+async def unprofiled_work_async():
+    """unprofiled_work() for coroutines: waits without blocking the event loop."""
+    if current_profile.get() is not None:
+        yield
+        return
+    while not _gate.try_enter():
+        await asyncio.sleep(_POLL_SECONDS)
+    try:
+        yield
+    finally:
+        _gate.leave()
+
+
+def profiling_allowed(admin_token: str) -> bool:
+    """True if profiling is enabled and admin_token matches PROFILE_ADMIN_TOKEN."""
+    return bool(PROFILE_ADMIN_TOKEN) and hmac.compare_digest(admin_token or "", PROFILE_ADMIN_TOKEN)
+
+
+class RequestProfile:
+    """CPU profile and allocation snapshots of one request, broken down by stage.
+
+    Each stage gets its own cProfile profiler and a tracemalloc diff of the allocations
+    still alive when it ends. Allocation tracing is process-wide, and from Python 3.12 on
+    so is cProfile, so a capture runs alone: it waits for work wrapped in unprofiled_work()
+    to finish and holds new work back until it ends. Anything not wrapped, such as the
+    event loop receiving other requests, can still appear in the profile. Before 3.12 a
+    profiler only sees the thread that started it, so enter a stage inside the thread that
+    does the work (e.g. in the function passed to asyncio.to_thread).
+    """
+
+    def __init__(self, source: str, name: str):
+        self.source = source
+        self.name = name
+        self.stages = []
+        self._profilers = []
+        self._started = None
+
+    @contextmanager
+    def capture(self):
+        """Trace allocations and make this the current profile for the enclosed block.
+
+        Blocks until other work has drained; see capture_async() for the event loop.
+        """
+        self._close_gate()
+        try:
+            _gate.wait_drained()
+            with self._capturing():
+                yield self
+        finally:
+            self._open_gate()
+
+    @asynccontextmanager
+    async def capture_async(self):
+        """capture() for coroutines: waits for other work without blocking the event loop."""
+        self._close_gate()
+        try:
+            while not _gate.drained():
+                await asyncio.sleep(_POLL_SECONDS)
+            with self._capturing():
+                yield self
+        finally:
+            self._open_gate()
+
+    def _close_gate(self):
+        if not _capture_lock.acquire(blocking=False):
+            raise ProfilingBusy("Another profiling capture is running")
+        _gate.close()
+
+    def _open_gate(self):
+        _gate.open()
+        _capture_lock.release()
+
+    @contextmanager
+    def _capturing(self):
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start()
+        token = current_profile.set(self)
+        self._started = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.total_seconds = time.perf_counter() - self._started
+            current_profile.reset(token)
+            if not was_tracing:
+                tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Profile the enclosed block as one stage of the request."""
+        before = _snapshot()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] - baseline
+            allocations = _snapshot().compare_to(before, "lineno")[:PROFILE_TOP_N]
+            self._profilers.append(profiler)
+            self.stages.append({
+                "stage": name,
+                "seconds": round(seconds, 6),
+                "peak_alloc_bytes": peak,
+                "top_functions": _top_functions(profiler),
+                "top_allocations": [
+                    {"site": str(diff.traceback[0]), "size_diff": diff.size_diff, "count_diff": diff.count_diff}
+                    for diff in allocations if diff.size_diff
+                ],
+            })
+
+    def report(self) -> dict:
+        return {
+            "source": self.source,
+            "name": self.name,
+            "total_seconds": round(self.total_seconds, 6),
+            "stages": self.stages,
+        }
+
+    def save(self, store) -> dict:
+        """Store the JSON report and the combined pstats data (for snakeviz etc.) in the output store."""
+        result = {}
+        if self._profilers:
+            stats = pstats.Stats(*self._profilers)
+            fd, tmp_path = tempfile.mkstemp(prefix="profile_", suffix=".prof")
+            os.close(fd)
+            try:
+                stats.dump_stats(tmp_path)
+                result["data"] = store.put_file(tmp_path, ".prof", source="profile", name=self.name)
+            finally:
+                os.remove(tmp_path)
+        report = self.report()
+        if "data" in result:
+            report["data_file"] = result["data"]["file_name"]
+        result["report"] = store.put_bytes(
+            json.dumps(report, indent=2).encode("utf-8"), ".json", source="profile", name=self.name
+        )
+        logger.info(f"Saved profile of {self.source} {self.name} as {result['report']['file_name']}")
+        return result
+
+
+def _snapshot():
+    return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+
+def _top_functions(profiler: cProfile.Profile) -> list:
+    stats = pstats.Stats(profiler).sort_stats(pstats.SortKey.CUMULATIVE)
+    functions = []
+    for func in stats.fcn_list[:PROFILE_TOP_N]:
+        primitive_calls, calls, tottime, cumtime, _ = stats.stats[func]
+        file_name, line, function = func
+        functions.append({
+            "function": f"{function} ({file_name}:{line})",
+            "calls": calls,
+            "primitive_calls": primitive_calls,
+            "tottime": round(tottime, 6),
+            "cumtime": round(cumtime, 6),
+        })
+    return functions
+
@@ -0,0 +1,155 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import xml.etree.ElementTree as ET
+from collections import deque
+from typing import Awaitable, Callable, Iterable, Optional
+from urllib.parse import urljoin, urlsplit
+
+from urls import normalize_url
+
+logger = logging.getLogger(__name__)
+
+# Pages fetched at the same time during a site crawl (per-host limits still apply)
+SITE_CRAWL_CONCURRENCY = int(os.getenv("SITE_CRAWL_CONCURRENCY", "4"))
+MAX_SITE_PAGES = int(os.getenv("MAX_SITE_PAGES", "500"))
+MAX_SITEMAP_URLS = int(os.getenv("MAX_SITEMAP_URLS", "10000"))
+
+# Markdown links and images: [text](url "title")
+MARKDOWN_LINK = re.compile(r"\]\(\s*<?([^)\s>]+)>?(?:\s+\"[^\"]*\")?\s*\)")
+# Resources that are never pages worth converting
+SKIPPED_EXTENSIONS = (
+    ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".ico", ".css", ".js", ".json", ".xml",
+    ".pdf", ".zip", ".gz", ".mp4", ".mp3", ".woff", ".woff2", ".ttf",
+)
+
+
+def site_host(url: str) -> str:
+    host = (urlsplit(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def extract_links(markdown: str, base_url: str) -> list:
+    """Absolute http(s) URLs linked from a page's Markdown."""
+    links = []
+    for href in MARKDOWN_LINK.findall(markdown or ""):
+        url = urljoin(base_url, href)
+        if urlsplit(url).scheme in ("http", "https"):
+            links.append(url)
+    return links
+
+
+def parse_sitemap(xml_text: str) -> tuple:
+    """Return (page_urls, nested_sitemap_urls) from a sitemap or sitemap index."""
+    try:
+        root = ET.fromstring(xml_text)
+    except ET.ParseError:
+        return [], []
+    locs = [el.text.strip() for el in root.iter() if el.tag.endswith("loc") and el.text]
+    if root.tag.endswith("sitemapindex"):
+        return [], locs
+    return locs, []
+
+
+class Frontier:
+    """Breadth-first frontier over one site that never yields the same page twice.
+
+    Seen URLs are kept as 8-byte digests of their normalized form, so even large sites
+    need only a few dozen bytes per URL.
+    """
+
+    def __init__(self, seed_url: str, max_depth: int):
+        self.host = site_host(seed_url)
+        self.max_depth = max_depth
+        self._queue = deque()
+        self._seen = set()
+
+    def _digest(self, url: str) -> bytes:
+        return hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest()
+
+    def add(self, url: str, depth: int) -> bool:
+        """Queue url at depth if it is on the site, within the depth limit and unseen."""
+        if depth > self.max_depth or site_host(url) != self.host:
+            return False
+        url = normalize_url(url)
+        if urlsplit(url).path.lower().endswith(SKIPPED_EXTENSIONS):
+            return False
+        digest = self._digest(url)
+        if digest in self._seen:
+            return False
+        self._seen.add(digest)
+        self._queue.append((url, depth))
+        return True
+
+    def add_many(self, urls: Iterable[str], depth: int) -> int:
+        return sum(1 for url in urls if self.add(url, depth))
+
+    def pop(self) -> tuple:
+        return self._queue.popleft()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    @property
+    def seen(self) -> int:
+        return len(self._seen)
+
+
+async def fetch_sitemap_urls(client, seed_url: str, max_urls: int = MAX_SITEMAP_URLS) -> list:
+    """Collect page URLs from the site's /sitemap.xml, following one level of sitemap index."""
+    parts = urlsplit(seed_url)
+    pending = [f"{parts.scheme}://{parts.netloc}/sitemap.xml"]
+    pages = []
+    fetched = 0
+    while pending and fetched < 20 and len(pages) < max_urls:
+        sitemap_url = pending.pop(0)
+        fetched += 1
+        try:
+            response = await client.get(sitemap_url)
+            if response.status_code != 200:
+                continue
+        except Exception as e:
+            logger.info(f"No sitemap at {sitemap_url}: {str(e)}")
+            continue
+        urls, nested = parse_sitemap(response.text)
+        pages.extend(urls)
+        pending.extend(nested)
+    return pages[:max_urls]
+
+
+async def crawl_site(seed_url: str, fetch: Callable[[str], Awaitable[dict]], max_depth: int = 2,
+                     max_pages: int = 100, concurrency: int = SITE_CRAWL_CONCURRENCY,
+                     sitemap_urls: Optional[list] = None) -> list:
+    """Crawl same-site pages breadth-first from seed_url, fetching up to concurrency at once.
+
+    fetch(url) must return a dict with "status" and, on success, "markdown"; links found in
+    the Markdown are followed until max_depth or max_pages is reached. Returns the fetch
+    results (without "markdown") in completion order, each with "url" and "depth".
+    """
+    frontier = Frontier(seed_url, max_depth)
+    frontier.add(seed_url, 0)
+    if sitemap_urls:
+        frontier.add_many(sitemap_urls, 1)
+
+    results = []
+    running = {}
+    started = 0
+    while frontier or running:
+        while frontier and len(running) < concurrency and started < max_pages:
+            url, depth = frontier.pop()
+            running[asyncio.ensure_future(fetch(url))] = (url, depth)
+            started += 1
+        if not running:
+            break
+        done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            url, depth = running.pop(task)
+            result = task.result()
+            markdown = result.pop("markdown", None)
+            if result.get("status") == "success" and depth < max_depth and started < max_pages:
+                frontier.add_many(extract_links(markdown, url), depth + 1)
+            results.append({"url": url, "depth": depth, **result})
+    logger.info(f"Site crawl of {seed_url} fetched {len(results)} pages ({frontier.seen} URLs seen)")
+    return results
@@ -0,0 +1,57 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+# Crawls running at the same time across all hosts
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "8"))
+# Crawls running at the same time against a single host
+PER_HOST_CONCURRENCY = int(os.getenv("PER_HOST_CONCURRENCY", "2"))
+# Minimum seconds between the start of two requests to the same host
+PER_HOST_DELAY = float(os.getenv("PER_HOST_DELAY", "0.5"))
+
+
+def host_of(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+class CrawlThrottle:
+    """Global concurrency cap plus a per-host politeness limit (concurrency and spacing)."""
+
+    def __init__(self, concurrency: int = CRAWL_CONCURRENCY, per_host: int = PER_HOST_CONCURRENCY,
+                 per_host_delay: float = PER_HOST_DELAY):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.per_host_delay = per_host_delay
+        self._global = asyncio.Semaphore(concurrency)
+        self._hosts = {}
+
+    def _host_state(self, host: str) -> dict:
+        state = self._hosts.get(host)
+        if state is None:
+            state = {"semaphore": asyncio.Semaphore(self.per_host), "lock": asyncio.Lock(),
+                     "next_start": 0.0, "users": 0}
+            self._hosts[host] = state
+        return state
+
+    @asynccontextmanager
+    async def limit(self, url: str):
+        """Wait for a free global slot, a free slot for the URL's host and the host delay."""
+        host = host_of(url)
+        state = self._host_state(host)
+        state["users"] += 1
+        try:
+            async with state["semaphore"]:
+                async with state["lock"]:
+                    loop = asyncio.get_running_loop()
+                    wait = state["next_start"] - loop.time()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    state["next_start"] = loop.time() + self.per_host_delay
+                async with self._global:
+                    yield
+        finally:
+            state["users"] -= 1
+            if state["users"] == 0 and state["next_start"] <= asyncio.get_running_loop().time():
+                # Forget idle hosts so the table does not grow with every host ever crawled
+                self._hosts.pop(host, None)